@@ -0,0 +1,32 @@
+"""
+Sertipy, Python library for the Sertiva Web API.
+
+Names are loaded on first access so `import sertipy` stays cheap,
+requests is only imported when the first request is sent.
+"""
+
+__all__ = ['Sertiva', 'SertivaAuth', 'SertivaPipeline', 'PipelineSummary', 'SertipyException']
+
+import importlib
+
+_lazy_names = {
+    'Sertiva': 'sertipy.client',
+    'SertivaAuth': 'sertipy.auth',
+    'SertivaPipeline': 'sertipy.pipeline',
+    'PipelineSummary': 'sertipy.pipeline',
+    'SertipyException': 'sertipy.exceptions',
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_names:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(_lazy_names[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,5 @@
+import sys
+
+from sertipy.cli import main
+
+sys.exit(main())
@@ -3,9 +3,10 @@ __all__ = ['SertivaAuth']
 import errno
 import json
 import logging
-import requests
+import threading
 
 from sertipy.exceptions import SertipyException
+from sertipy.transport import RequestsTransport
 
 logger = logging.getLogger(__name__)
 
@@ -67,15 +68,34 @@ class CacheHandler:
             logger.warning(f"[SERTIPY] Could not write token to cache at {self.cached_token_path}")
 
 
+class MemoryCacheHandler(CacheHandler):
+    """
+    Keep the token in memory only, the cache file is never read or written
+    """
+
+    def get_cached_token(self) -> str:
+        return self.cached_token_info
+
+    def saved_token_to_cache(self, token_info: str) -> None:
+        self.cached_token_info = token_info
+
+
 class SertivaAuth:
     """
     client_id, client_secret from sertiva
     """
 
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(self, client_id: str, client_secret: str, transport=None, cache_handler: CacheHandler = None):
         self.client_id = client_id
         self.client_secret = client_secret
-        self.auth_cache = CacheHandler()
+        self.transport = transport or RequestsTransport()
+
+        # an offline transport (replay) must not read or overwrite the shared token cache
+        if cache_handler is None and getattr(self.transport, 'offline', False):
+            cache_handler = MemoryCacheHandler()
+
+        self.auth_cache = cache_handler or CacheHandler()
+        self._lock = threading.Lock()
 
     def get_token(self):
         # get token from cache
@@ -84,15 +104,25 @@ class SertivaAuth:
         if access_token:
             return access_token
 
-        # request token
-        access_token = self.__get_access_token()
+        # only one thread requests a new token, the others wait for the cache
+        with self._lock:
+            access_token = self.auth_cache.get_cached_token()
 
-        # saving to cache
-        self.auth_cache.saved_token_to_cache(access_token['data']['access_token'])
+            if access_token:
+                return access_token
+
+            # request token
+            access_token = self.__get_access_token()
+
+            # saving to cache
+            self.auth_cache.saved_token_to_cache(access_token['data']['access_token'])
 
         return self.auth_cache.get_cached_token()
 
     def __get_access_token(self):
+        # requests is imported on the first token request, a cached token does not need it
+        import requests
+
         logger.info('[SERTIPY] Request access token to Sertiva')
         url = 'https://api.sertiva.id/api/v2/authorization'
         payload = {
@@ -103,7 +133,7 @@ class SertivaAuth:
         logger.debug('[SERTIPY] Sending POST request token to Sertiva Authorization')
 
         try:
-            response = requests.post(url, json=payload)
+            response = self.transport('POST', url, payload=payload)
             response.raise_for_status()
             results = response.json()
         except requests.exceptions.HTTPError as http_error:
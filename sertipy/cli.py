@@ -0,0 +1,488 @@
+"""
+Command line tool for bulk operations on Sertiva
+
+    sertipy issue <template_id> recipients.csv --issuance-date ... --expiration-date ...
+    sertipy verify ids.txt
+    sertipy revoke ids.txt --reason 'wrong certificate'
+    sertipy export credentials --output credentials.jsonl
+    sertipy sync <template_id> recipients.jsonl
+
+client id and secret are read from --client-id/--client-secret or
+SERTIVA_CLIENT_ID/SERTIVA_CLIENT_SECRET.
+"""
+
+__all__ = ['main']
+
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+from typing import Callable, Dict, Iterable, Iterator, List, Set
+
+from sertipy.client import Sertiva
+from sertipy.exceptions import SertipyException
+from sertipy.pipeline import chunked, response_ids, run_chunks
+
+logger = logging.getLogger(__name__)
+
+# status of a verification step telling the credential is not valid
+INVALID_STATUSES = {'failed', 'failure', 'error', 'invalid', 'revoked', 'expired'}
+
+
+def _nest(row: dict) -> dict:
+    """ Turn csv columns like fields.credentialSubject.activityDate into nested dict """
+    nested = {}
+    for column, value in row.items():
+        if value in (None, ''):
+            continue
+        target = nested
+        *parents, name = column.split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return nested
+
+
+def _read_jsonl(lines: Iterable[str], path: str) -> Iterator[dict]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise ValueError(f'{path} line {number} is not valid json: {error}') from None
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """ Read recipient rows from a .csv or .jsonl file, one row at a time
+    a line which is not valid json raises ValueError with its line number
+    :param path: path to the file, '-' for jsonl on stdin
+    """
+    if path == '-':
+        yield from _read_jsonl(sys.stdin, 'stdin')
+        return
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            yield from (_nest(row) for row in csv.DictReader(f))
+        else:
+            yield from _read_jsonl(f, path)
+
+
+def read_ids(path: str) -> Iterator[str]:
+    """ Read one id per line
+    :param path: path to the file, '-' for stdin
+    """
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        yield from (line.strip() for line in f if line.strip())
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class Checkpoint:
+    """
+    Chunks finished (and created, for issue) saved to a file, so a stopped job can resume.
+    The first line keeps the command and the chunk size, resuming another command or with another
+    chunk size is refused. A last line cut off by a crash is dropped.
+    """
+
+    def __init__(self, path: str = None, chunk_size: int = None, command: str = None):
+        self.path = path
+        self.done = set()
+        self.created: Dict[int, List[str]] = {}
+        self.ids: Dict[int, List[str]] = {}
+
+        if not path:
+            return
+
+        header = {"command": command, "chunk_size": chunk_size}
+
+        entries = self._load(path) if os.path.exists(path) else []
+
+        if not entries:
+            self._write(header)
+            return
+
+        saved = {key: entries[0].get(key) for key in header}
+        if saved != header:
+            raise SertipyException(None, f'checkpoint {path} was written by {saved["command"]} with '
+                                         f'--chunk-size {saved["chunk_size"]}, not {command} with '
+                                         f'--chunk-size {chunk_size}', reason='checkpoint mismatch')
+
+        for entry in entries[1:]:
+            if entry['stage'] == 'created':
+                self.created[entry['chunk']] = entry['ids']
+            else:
+                self.done.add(entry['chunk'])
+                if entry.get('ids'):
+                    self.ids[entry['chunk']] = entry['ids']
+
+        for index in self.done:
+            self.created.pop(index, None)
+
+        logger.info(f'[SERTIPY] Resume from checkpoint {path}, {len(self.done)} chunks done, '
+                    f'{len(self.created)} created')
+
+    @staticmethod
+    def _load(path: str) -> List[dict]:
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+
+        entries = []
+        complete = list(lines)
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if number < len(lines):
+                    raise ValueError(f'checkpoint {path} line {number} is not valid json') from None
+
+                # written partly when the job stopped, its chunk is sent again
+                logger.warning(f'[SERTIPY] Drop the incomplete last line of checkpoint {path}')
+                complete.pop()
+
+        if complete and not complete[-1].endswith('\n'):
+            complete[-1] += '\n'
+
+        # the next entries are appended after a complete line
+        if complete != lines:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(complete)
+
+        return entries
+
+    def mark_created(self, index: int, ids: List[str]) -> None:
+        """ The recipients of the chunk are created, only the issue is left """
+        self.created[index] = ids
+        self._write({"chunk": index, "stage": "created", "ids": ids})
+
+    def mark(self, index: int, ids: List[str] = None) -> None:
+        """ The chunk is finished, ids created for it may be saved with it """
+        self.done.add(index)
+        self.created.pop(index, None)
+        entry = {"chunk": index, "stage": "done"}
+        if ids:
+            self.ids[index] = ids
+            entry['ids'] = ids
+        self._write(entry)
+
+    def _write(self, entry: dict) -> None:
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+class Progress:
+    """
+    Print processed rows and throughput to stderr at most every `interval` seconds
+    """
+
+    def __init__(self, action: str, interval: float = 1.0, stream=None):
+        self.action = action
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.rows = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._printed = self.started
+
+    def update(self, rows: int = 0, failed: int = 0) -> None:
+        self.rows += rows
+        self.failed += failed
+        now = time.monotonic()
+        if now - self._printed >= self.interval:
+            self._printed = now
+            self._print(now)
+
+    def finish(self) -> None:
+        self._print(time.monotonic(), final=True)
+
+    def _print(self, now: float, final: bool = False) -> None:
+        elapsed = max(now - self.started, 1e-9)
+        line = f'{self.action} {self.rows} rows, {self.failed} failed, {self.rows / elapsed:.1f} rows/s'
+        if final:
+            line += f' in {elapsed:.1f}s'
+        print(line, file=self.stream, flush=True)
+
+
+@contextlib.contextmanager
+def _open_output(path: str, append: bool = False):
+    """ Output file, '-' for stdout """
+    if path == '-':
+        yield sys.stdout
+        return
+
+    with open(path, 'a' if append else 'w', encoding='utf-8') as output:
+        yield output
+
+
+def _write_jsonl(items: Iterable[dict], output, progress: Progress) -> None:
+    for item in items:
+        output.write(json.dumps(item) + '\n')
+        progress.update(1)
+
+
+def _is_valid(result: dict) -> bool:
+    """ False when a verify result tells the credential is not valid: valid false, revoked or a failed step """
+    if not isinstance(result, dict):
+        return False
+    if result.get('valid') is False or result.get('revoked'):
+        return False
+
+    for step in result.get('verification') or []:
+        if isinstance(step, dict) and (step.get('valid') is False or
+                                       str(step.get('status', '')).lower() in INVALID_STATUSES):
+            return False
+
+    return True
+
+
+def _run_bulk(fn, ids: Iterable[str], args, action: str, on_result: Callable[[any], None] = None) -> int:
+    checkpoint = Checkpoint(args.checkpoint, args.chunk_size, args.command)
+    progress = Progress(action)
+
+    for index, chunk, result, error in run_chunks(fn, chunked(ids, args.chunk_size), workers=args.concurrency,
+                                                  skip=checkpoint.done):
+        if error:
+            progress.update(failed=len(chunk))
+            continue
+        if on_result:
+            on_result(result)
+        checkpoint.mark(index)
+        progress.update(len(chunk))
+
+    progress.finish()
+    return 1 if progress.failed else 0
+
+
+def cmd_issue(sertiva: Sertiva, args) -> int:
+    checkpoint = Checkpoint(args.checkpoint, args.chunk_size, args.command)
+    progress = Progress('issued')
+    issued = [0]
+
+    def on_chunk(index, summary):
+        checkpoint.mark(index)
+        progress.update(summary.credentials_issued - issued[0])
+        issued[0] = summary.credentials_issued
+
+    pipeline = sertiva.pipeline(chunk_size=args.chunk_size, create_workers=args.concurrency,
+                                issue_workers=args.concurrency) \
+        .use_template(args.template_id) \
+        .recipients(read_rows(args.file), skip_chunks=checkpoint.done, created=checkpoint.created) \
+        .issue(args.issuance_date, args.expiration_date)
+
+    if args.verify_sample:
+        pipeline.verify(args.verify_sample)
+
+    if args.validate:
+        pipeline.validate()
+
+    summary = pipeline.run(on_chunk=on_chunk, on_created=checkpoint.mark_created)
+    progress.failed = summary.failed_rows + len(summary.rejected)
+    progress.finish()
+
+    for stage, index, error in summary.errors:
+        print(f'chunk {index} {stage} failed: {error}', file=sys.stderr)
+
+    for index, _, errors in summary.rejected:
+        print(f'row {index} rejected: {"; ".join(errors)}', file=sys.stderr)
+
+    return 0 if summary.ok and not summary.rejected else 1
+
+
+def cmd_verify(sertiva: Sertiva, args) -> int:
+    """ write the verify result of every credential as jsonl, exit 3 when all requests succeeded
+    but some credentials are not valid
+    """
+    invalid = [0]
+
+    # a resumed run appends, the results of the finished chunks are already in the output
+    with _open_output(args.output, append=bool(args.checkpoint)) as output:
+        def on_result(response):
+            for result in response['data']:
+                output.write(json.dumps(result) + '\n')
+                if not _is_valid(result):
+                    invalid[0] += 1
+            output.flush()
+
+        code = _run_bulk(sertiva.mains.verify, read_ids(args.file), args, 'verified', on_result)
+
+    if invalid[0]:
+        print(f'sertipy: {invalid[0]} credentials are not valid', file=sys.stderr)
+        return code or 3
+
+    return code
+
+
+def cmd_revoke(sertiva: Sertiva, args) -> int:
+    return _run_bulk(lambda ids: sertiva.mains.revoke(ids, args.reason), read_ids(args.file), args, 'revoked')
+
+
+def cmd_export(sertiva: Sertiva, args) -> int:
+    if args.resource == 'recipients':
+        if not args.template_id:
+            raise SertipyException(None, 'export recipients needs --template-id', reason='missing argument')
+        items = sertiva.recipients.list_all(args.template_id, workers=args.concurrency, stream=args.stream)
+    else:
+        items = sertiva.credentials.list_all(workers=args.concurrency, stream=args.stream)
+
+    progress = Progress('exported')
+
+    with _open_output(args.output) as output:
+        _write_jsonl(items, output, progress)
+
+    progress.finish()
+    return 0
+
+
+def cmd_sync(sertiva: Sertiva, args) -> int:
+    """ rows with id update the draft recipient, rows without id are created,
+    with --delete-missing the draft recipients neither in the file nor created are deleted at the end
+    """
+    checkpoint = Checkpoint(args.checkpoint, args.chunk_size, args.command)
+    progress = Progress('synced')
+    keep: Set[str] = set()
+
+    def sync_chunk(chunk: List[dict]) -> List[str]:
+        # update first, the chunk is only finished once the create (not idempotent) succeeded
+        to_update = [row for row in chunk if row.get('id')]
+        to_create = [row for row in chunk if not row.get('id')]
+        if to_update:
+            sertiva.recipients.update(args.template_id, to_update)
+        if to_create:
+            return response_ids(sertiva.recipients.create(args.template_id, to_create), 'recipients')
+        return []
+
+    def read_chunks() -> Iterator[List[dict]]:
+        for index, chunk in enumerate(chunked(read_rows(args.file), args.chunk_size)):
+            keep.update(row['id'] for row in chunk if row.get('id'))
+            keep.update(checkpoint.ids.get(index, ()))
+            yield chunk
+
+    for index, chunk, ids, error in run_chunks(sync_chunk, read_chunks(), workers=args.concurrency,
+                                               skip=checkpoint.done):
+        if error:
+            progress.update(failed=len(chunk))
+            continue
+        keep.update(ids)
+        checkpoint.mark(index, ids)
+        progress.update(len(chunk))
+
+    if args.delete_missing and progress.failed:
+        print('sertipy: some rows failed, draft recipients are not deleted', file=sys.stderr)
+    elif args.delete_missing:
+        to_delete = [recipient['id'] for recipient in
+                     sertiva.recipients.list_all(args.template_id, workers=args.concurrency)
+                     if recipient['id'] not in keep]
+
+        for _, chunk, _, error in run_chunks(lambda ids: sertiva.recipients.delete(args.template_id, ids),
+                                             chunked(to_delete, args.chunk_size), workers=args.concurrency):
+            if error:
+                progress.update(failed=len(chunk))
+            else:
+                progress.update(len(chunk))
+
+    progress.finish()
+    return 1 if progress.failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='sertipy', description='Bulk operations on the Sertiva Web API')
+    parser.add_argument('--client-id', default=os.environ.get('SERTIVA_CLIENT_ID'))
+    parser.add_argument('--client-secret', default=os.environ.get('SERTIVA_CLIENT_SECRET'))
+    parser.add_argument('--concurrency', type=int, default=4, help='parallel requests (default 4)')
+    parser.add_argument('--chunk-size', type=int, default=100, help='rows or ids in one request (default 100)')
+    parser.add_argument('--rate-limit', type=float, help='maximum requests per second')
+    parser.add_argument('--checkpoint', help='file of finished chunks, an existing file resumes the job '
+                                             '(issue, verify, revoke, sync)')
+    parser.add_argument('--record', metavar='FILE', help='append anonymised request/response pairs to FILE')
+    parser.add_argument('--replay', metavar='FILE', help='answer requests from FILE instead of Sertiva')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='replay latency divided by this factor')
+    parser.add_argument('-v', '--verbose', action='store_true')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    issue = commands.add_parser('issue', help='create recipients from a csv/jsonl file and issue credentials')
+    issue.add_argument('template_id')
+    issue.add_argument('file', help='.csv or .jsonl recipients, '
+                                    'csv columns may be dotted (fields.credentialSubject.x)')
+    issue.add_argument('--issuance-date', required=True)
+    issue.add_argument('--expiration-date', required=True)
+    issue.add_argument('--verify-sample', type=int, default=0,
+                       help='credentials verified from each issued chunk')
+    issue.add_argument('--validate', action='store_true', help='skip rows not matching the template fields')
+    issue.set_defaults(func=cmd_issue)
+
+    verify = commands.add_parser('verify', help='verify credential ids, one per line, results written as jsonl')
+    verify.add_argument('file')
+    verify.add_argument('--output', default='-', help='jsonl results, appended when resuming with --checkpoint')
+    verify.set_defaults(func=cmd_verify)
+
+    revoke = commands.add_parser('revoke', help='revoke credential ids, one per line')
+    revoke.add_argument('file')
+    revoke.add_argument('--reason', required=True)
+    revoke.set_defaults(func=cmd_revoke)
+
+    export = commands.add_parser('export', help='export all credentials or draft recipients as jsonl')
+    export.add_argument('resource', choices=['credentials', 'recipients'])
+    export.add_argument('--template-id')
+    export.add_argument('--output', default='-')
+    export.add_argument('--stream', action='store_true',
+                        help='parse pages while they are downloaded, one page at a time, to bound memory')
+    export.set_defaults(func=cmd_export)
+
+    sync = commands.add_parser('sync', help='create and update draft recipients from a csv/jsonl file')
+    sync.add_argument('template_id')
+    sync.add_argument('file')
+    sync.add_argument('--delete-missing', action='store_true', help='delete draft recipients not in the file')
+    sync.set_defaults(func=cmd_sync)
+
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    if not args.replay and (not args.client_id or not args.client_secret):
+        print('sertipy: client id and secret are required (--client-id/--client-secret or '
+              'SERTIVA_CLIENT_ID/SERTIVA_CLIENT_SECRET)', file=sys.stderr)
+        return 2
+
+    if args.checkpoint and args.command == 'export':
+        print('sertipy: --checkpoint is not supported by export', file=sys.stderr)
+        return 2
+
+    if getattr(args, 'file', '-') != '-' and not os.path.isfile(args.file):
+        print(f'sertipy: {args.file} is not a file', file=sys.stderr)
+        return 2
+
+    transport = None
+    if args.replay or args.record:
+        from sertipy.replay import RecordingTransport, ReplayTransport
+
+        if args.replay:
+            transport = ReplayTransport(args.replay, speed=args.replay_speed)
+        if args.record:
+            transport = RecordingTransport(args.record, transport)
+
+    sertiva = Sertiva(args.client_id or '', args.client_secret or '', rate_limit=args.rate_limit,
+                      transport=transport)
+
+    try:
+        return args.func(sertiva, args)
+    except SertipyException as error:
+        print(f'sertipy: {error}', file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as error:
+        print(f'sertipy: {error}', file=sys.stderr)
+        return 2
@@ -1,61 +1,279 @@
 __all__ = ['Sertiva']
 
+import itertools
 import logging
-import requests
+import threading
 
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple, TYPE_CHECKING
 
 from sertipy.auth import SertivaAuth
-from sertipy.exceptions import SertipyException
+from sertipy.exceptions import SertipyException, SertipyValidationError
+from sertipy.streaming import iter_items, DEFAULT_MAX_BUFFER_SIZE
+from sertipy.transport import RequestsTransport
+from sertipy.validation import TemplateValidators
+
+if TYPE_CHECKING:
+    from sertipy.pipeline import SertivaPipeline
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _last_page(meta) -> int:
+    if not isinstance(meta, dict):
+        return None
+
+    for key in ('last_page', 'total_pages', 'total_page'):
+        if meta.get(key):
+            return int(meta[key])
+
+    return None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between the threads asking for the same key,
+    every caller receives its result or its error
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[tuple, _Call] = {}
+
+    def do(self, key: tuple, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            logger.debug(f'[SERTIPY] Waiting for in-flight request {key}')
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class _StreamedItems:
+    """
+    Items of a streamed response, the response is closed when the items are read,
+    when close() is called or when the iterator is dropped unused
+    """
+
+    def __init__(self, response, path: Tuple[str, ...], max_buffer_size: int):
+        self.response = response
+        self._items = iter_items(response.iter_content(STREAM_CHUNK_SIZE), path, max_buffer_size)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._items)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._items.close()
+        self.response.close()
+
+    def __del__(self):
+        self.close()
+
 
 class SertivaBaseRequest:
-    def __init__(self, auth):
+    def __init__(self, auth, rate_limiter=None, transport=None, max_buffer_size: int = DEFAULT_MAX_BUFFER_SIZE):
         self.prefix = 'https://api.sertiva.id/api/v2/'
         self.auth = auth
+        self.rate_limiter = rate_limiter
+        self.transport = transport or RequestsTransport()
+        self.max_buffer_size = max_buffer_size
+        self.single_flight = SingleFlight()
+        self._validators = None
+
+    @property
+    def validators(self) -> TemplateValidators:
+        """ Validators of the template fields, shared by Sertiva or built on first use """
+        if self._validators is None:
+            options = (self.auth, self.rate_limiter, self.transport, self.max_buffer_size)
+            self._validators = TemplateValidators(SertivaTemplate(*options), SertivaDesign(*options))
+        return self._validators
+
+    @validators.setter
+    def validators(self, validators: TemplateValidators) -> None:
+        self._validators = validators
 
     def _auth_headers(self) -> Dict[str, str]:
         return {"Authorization": "Bearer {0}".format(self.auth.get_token())}
 
-    def _internal_call(self, method: str, url: str, payload=None, params=None) -> Dict[str, any]:
-        allowed_methods = {
-            'GET': requests.get,
-            'POST': requests.post,
-            'PATCH': requests.patch,
-            'DELETE': requests.delete
-        }
+    def _internal_call(self, method: str, url: str, payload=None, params=None, stream_key: str = None):
+        """ Send the request and return the decoded response
+        with stream_key, return an iterator of the items in response['data'][stream_key] parsed while the body
+        is read, the request is sent before this method returns
+        """
+        if stream_key:
+            return self._stream(method, url, ('data', stream_key), payload, params)
 
-        try:
-            if params:
-                response = allowed_methods[method](self.prefix + url, headers=self._auth_headers(),
-                                                   params=params, json=payload)
-            else:
-                response = allowed_methods[method](self.prefix + url, headers=self._auth_headers(), json=payload)
+        # identical GET requests in flight at the same time share one response
+        if method == 'GET' and payload is None:
+            key = (method, url, tuple(sorted((params or {}).items())))
+            return self.single_flight.do(key, lambda: self._send(method, url, payload, params))
+
+        return self._send(method, url, payload, params)
+
+    def _send(self, method: str, url: str, payload=None, params=None) -> Dict[str, any]:
+        # requests is imported on the first call to keep `import sertipy` fast
+        import requests
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
 
+        try:
+            response = self.transport(method, self.prefix + url, headers=self._auth_headers(),
+                                      params=params, payload=payload)
             response.raise_for_status()
             results = response.json()
 
         except requests.exceptions.HTTPError as http_error:
-            response = http_error.response
-            logger.error(f'[SERTIPY] Failed to request {url}')
-
-            raise SertipyException(
-                response.status_code,
-                "%s:\n %s" % (response.url, response.json()['message']),
-                reason=response.reason, )
+            self._raise_http_error(http_error.response, url)
 
         logger.info('[SERTIPY] Success to request internal API Sertiva')
 
         return results
 
+    def _stream(self, method: str, url: str, path: Tuple[str, ...], payload=None,
+                params=None) -> '_StreamedItems':
+        import requests
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        response = self.transport(method, self.prefix + url, headers=self._auth_headers(),
+                                  params=params, payload=payload, stream=True)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as http_error:
+            try:
+                self._raise_http_error(http_error.response, url)
+            finally:
+                response.close()
+
+        logger.info('[SERTIPY] Success to request internal API Sertiva, streaming response')
+
+        return _StreamedItems(response, path, self.max_buffer_size)
+
+    @staticmethod
+    def _raise_http_error(response, url: str):
+        logger.error(f'[SERTIPY] Failed to request {url}')
+
+        raise SertipyException(
+            response.status_code,
+            "%s:\n %s" % (response.url, response.json()['message']),
+            reason=response.reason, )
+
+    def _validated(self, template_id: str, recipients: List[dict]) -> List[dict]:
+        """ Check recipients with the validator of the template, raise SertipyValidationError before upload """
+        result = self.validators.get(template_id).partition(recipients)
+
+        if result.invalid:
+            logger.error(f'[SERTIPY] {len(result.invalid)} invalid recipients for template {template_id}')
+            raise SertipyValidationError(result.invalid)
+
+        return result.valid
+
+    def _iter_pages(self, fetch_page, key: str, workers: int = 1, stream: bool = False) -> Iterator[dict]:
+        """ Yield the items of every page in order
+        when the first page tells the last page, the next pages are fetched with `workers` threads
+        :param fetch_page: function(number_of_page, stream) returning the response of one page
+        :param key: name of the list in the data (credentials, recipients)
+        :param workers: parallel page requests
+        :param stream: stream every page one after another, memory stays bounded. The page count is not known
+            while streaming, it stops after an empty page, a page with fewer items than the first one or a page
+            starting with the same item as the previous one (an api answering the last page again)
+        """
+        if stream:
+            page = 1
+            page_size = None
+            previous_first = None
+            while True:
+                count = 0
+                first = None
+                for item in fetch_page(page, True):
+                    if count == 0:
+                        first = item
+                        if page > 1 and first == previous_first:
+                            break
+                    count += 1
+                    yield item
+                if count == 0 or (page_size is not None and count < page_size):
+                    return
+                page_size = page_size or count
+                previous_first = first
+                page += 1
+
+        response = fetch_page(1)
+        yield from response['data'][key]
+
+        last_page = _last_page(response['data'].get('meta'))
+
+        if last_page is None:
+            page = 1
+            while response['data'][key]:
+                page += 1
+                response = fetch_page(page)
+                yield from response['data'][key]
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        pages = iter(range(2, last_page + 1))
+        with ThreadPoolExecutor(workers) as pool:
+            # keep at most 2 * workers pages in memory
+            pending = [pool.submit(fetch_page, page) for page in itertools.islice(pages, 2 * workers)]
+            while pending:
+                response = pending.pop(0).result()
+                page = next(pages, None)
+                if page is not None:
+                    pending.append(pool.submit(fetch_page, page))
+                yield from response['data'][key]
+
 
 class SertivaDesign(SertivaBaseRequest):
-    def list(self, number_of_page: int = 1):
-        """ To get list design certificate"""
+    def list(self, number_of_page: int = 1, stream: bool = False):
+        """ To get list design certificate
+        :param stream: return an iterator of the designs, parsed while the response is read
+        """
         logger.debug('[SERTIPY] Sending GET request list designs to Sertiva')
-        return self._internal_call('GET', 'designs', {"page": number_of_page})
+        return self._internal_call('GET', 'designs', params={"page": number_of_page},
+                                   stream_key='designs' if stream else None)
 
     def detail(self, design_id: str):
         """ To get detail design certificate
@@ -66,10 +284,13 @@ class SertivaDesign(SertivaBaseRequest):
 
 
 class SertivaTemplate(SertivaBaseRequest):
-    def list(self, number_of_page: int = 1):
-        """ To get list templates"""
+    def list(self, number_of_page: int = 1, stream: bool = False):
+        """ To get list templates
+        :param stream: return an iterator of the templates, parsed while the response is read
+        """
         logger.debug('[SERTIPY] Sending GET request list templates to Sertiva')
-        return self._internal_call('GET', 'templates', {"page": number_of_page})
+        return self._internal_call('GET', 'templates', params={"page": number_of_page},
+                                   stream_key='templates' if stream else None)
 
     def detail(self, template_id: str):
         """ To get detail template certificate
@@ -107,16 +328,32 @@ class SertivaTemplate(SertivaBaseRequest):
 
 
 class SertivaRecipient(SertivaBaseRequest):
-    def list(self, template_id: str, number_of_page: int = 1):
-        """ To get list recipients"""
+    def list(self, template_id: str, number_of_page: int = 1, stream: bool = False):
+        """ To get list recipients
+        :param stream: return an iterator of the recipients, parsed while the response is read
+        """
         logger.debug('[SERTIPY] Sending GET request List Draft Recipient to Sertiva')
-        return self._internal_call('GET', f'templates/{template_id}/recipients', {"page": number_of_page})
+        return self._internal_call('GET', f'templates/{template_id}/recipients', params={"page": number_of_page},
+                                   stream_key='recipients' if stream else None)
 
-    def create(self, template_id: str, recipient_data: List[dict]):
+    def list_all(self, template_id: str, workers: int = 1, stream: bool = False) -> Iterator[dict]:
+        """ To iterate all draft recipients of the template, page by page
+        :param template_id: id form template
+        :param workers: parallel page requests
+        :param stream: stream the pages one after another instead of loading whole pages
+        """
+        return self._iter_pages(lambda page, stream=False: self.list(template_id, page, stream), 'recipients',
+                                workers, stream)
+
+    def create(self, template_id: str, recipient_data: List[dict], validate: bool = False):
         """ To get create new draft recipients
         :param template_id: id form template
         :param recipient_data: data recipient (contain recipient_id)
+        :param validate: check recipient_data with the template fields before upload
         """
+        if validate:
+            recipient_data = self._validated(template_id, recipient_data)
+
         payload = {
             'recipients': recipient_data
         }
@@ -147,10 +384,20 @@ class SertivaRecipient(SertivaBaseRequest):
 
 
 class SertivaCredential(SertivaBaseRequest):
-    def list(self, number_of_page: int = 1):
-        """ To get list credentials"""
+    def list(self, number_of_page: int = 1, stream: bool = False):
+        """ To get list credentials
+        :param stream: return an iterator of the credentials, parsed while the response is read
+        """
         logger.debug('[SERTIPY] Sending GET request list credentials to Sertiva')
-        return self._internal_call('GET', 'credentials', {"page": number_of_page})
+        return self._internal_call('GET', 'credentials', params={"page": number_of_page},
+                                   stream_key='credentials' if stream else None)
+
+    def list_all(self, workers: int = 1, stream: bool = False) -> Iterator[dict]:
+        """ To iterate all credentials, page by page
+        :param workers: parallel page requests
+        :param stream: stream the pages one after another instead of loading whole pages
+        """
+        return self._iter_pages(self.list, 'credentials', workers, stream)
 
     def detail(self, credential_id: str):
         """ To get detail credential
@@ -162,7 +409,8 @@ class SertivaCredential(SertivaBaseRequest):
 
 class SertivaMain(SertivaBaseRequest):
     def issue(self, template_id: str, issuance_date: str,
-              expiration_date: str, recipient_ids: List[str] = None, recipients: List[dict] = None):
+              expiration_date: str, recipient_ids: List[str] = None, recipients: List[dict] = None,
+              validate: bool = False, stream: bool = False):
         """ To issue new credential/certificate
         when param recipients None and recipient ids None.
         it means, issue new credential will all data recipients draft in the template
@@ -172,7 +420,15 @@ class SertivaMain(SertivaBaseRequest):
 
         :param recipient_ids: list ids recipient -> issue new credential with list ids recipient
         :param recipients: list data recipient -> issue new credential with directly data recipients
+        :param validate: check recipients with the template fields before upload, only with recipients,
+            draft recipients are validated by recipients.create(..., validate=True)
+        :param stream: return an iterator of the issued credentials, parsed while the response is read
         """
+        if validate and not recipients:
+            raise SertipyException(None, 'validate needs recipients, draft recipients are validated '
+                                         'when created', reason='invalid argument')
+
+        stream_key = 'credentials' if stream else None
         payload = {
             'template_id': template_id,
             'issuance_date': issuance_date,
@@ -183,17 +439,19 @@ class SertivaMain(SertivaBaseRequest):
             payload['recipient_ids'] = recipient_ids
             logger.debug('[SERTIPY] Sending POST request issue new credential to Sertiva '
                          'with ids recipient')
-            return self._internal_call('POST', 'issue', payload)
+            return self._internal_call('POST', 'issue', payload, stream_key=stream_key)
 
         if recipients:
+            if validate:
+                recipients = self._validated(template_id, recipients)
             payload['recipients'] = recipients
             logger.debug('[SERTIPY] Sending POST request issue new credential to Sertiva '
                          'with directly data recipients')
-            return self._internal_call('POST', 'issue', payload)
+            return self._internal_call('POST', 'issue', payload, stream_key=stream_key)
 
         logger.debug('[SERTIPY] Sending POST request issue new credential to Sertiva '
                      'with all draft recipients in the template')
-        return self._internal_call('POST', 'issue', payload)
+        return self._internal_call('POST', 'issue', payload, stream_key=stream_key)
 
     def verify(self, credential_ids: List[str]):
         """ To verify validation credential/certificate
@@ -219,10 +477,40 @@ class SertivaMain(SertivaBaseRequest):
 
 
 class Sertiva:
-    def __init__(self, client_id: str, client_secret: str):
-        self.auth = SertivaAuth(client_id, client_secret)
-        self.designs = SertivaDesign(self.auth)
-        self.templates = SertivaTemplate(self.auth)
-        self.recipients = SertivaRecipient(self.auth)
-        self.credentials = SertivaCredential(self.auth)
-        self.mains = SertivaMain(self.auth)
+    def __init__(self, client_id: str, client_secret: str, rate_limit: float = None, transport=None,
+                 max_buffer_size: int = DEFAULT_MAX_BUFFER_SIZE, cache_handler=None):
+        """
+        :param client_id: client id from Sertiva
+        :param client_secret: client secret from Sertiva
+        :param rate_limit: maximum requests per second shared by all threads, None for no limit
+        :param transport: callable sending the requests, default RequestsTransport
+            (see sertipy.replay for recording and replaying traffic)
+        :param max_buffer_size: maximum characters buffered for one item of a streamed response
+        :param cache_handler: token cache, default the .cache file (in memory with a replay transport)
+        """
+        rate_limiter = None
+        if rate_limit:
+            from sertipy.ratelimit import RateLimiter
+            rate_limiter = RateLimiter(rate_limit)
+
+        transport = transport or RequestsTransport()
+
+        self.auth = SertivaAuth(client_id, client_secret, transport, cache_handler)
+        self.designs = SertivaDesign(self.auth, rate_limiter, transport, max_buffer_size)
+        self.templates = SertivaTemplate(self.auth, rate_limiter, transport, max_buffer_size)
+        self.recipients = SertivaRecipient(self.auth, rate_limiter, transport, max_buffer_size)
+        self.credentials = SertivaCredential(self.auth, rate_limiter, transport, max_buffer_size)
+        self.mains = SertivaMain(self.auth, rate_limiter, transport, max_buffer_size)
+
+        # template fields are fetched and compiled once per template id
+        self.validators = TemplateValidators(self.templates, self.designs)
+        self.recipients.validators = self.validators
+        self.mains.validators = self.validators
+
+    def pipeline(self, **kwargs) -> 'SertivaPipeline':
+        """ To chain create template, create recipients, issue and verify with the stages overlapped
+        :param kwargs: options of SertivaPipeline (chunk_size, create_workers, issue_workers, ...)
+        """
+        from sertipy.pipeline import SertivaPipeline
+
+        return SertivaPipeline(self, **kwargs)
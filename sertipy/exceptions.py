@@ -7,3 +7,15 @@ class SertipyException(Exception):
 
     def __str__(self):
         return f'http status: {self.http_status}, {self.msg}, reason: {self.reason}'
+
+
+class SertipyValidationError(SertipyException):
+    """
+    Raised before upload when recipient rows do not match the template fields
+    invalid: list of (index, row, errors)
+    """
+
+    def __init__(self, invalid, msg=None):
+        super().__init__(None, msg or f'{len(invalid)} invalid recipients, first: {invalid[0][2]}',
+                         reason='invalid recipients')
+        self.invalid = invalid
@@ -0,0 +1,337 @@
+__all__ = ['SertivaPipeline', 'PipelineSummary', 'run_chunks']
+
+import itertools
+import logging
+import random
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, List, Dict, Tuple
+
+from sertipy.exceptions import SertipyException
+
+logger = logging.getLogger(__name__)
+
+
+def chunked(rows: Iterable, chunk_size: int) -> Iterator[list]:
+    """ Split rows into lists of chunk_size items without reading the whole iterable
+    :param rows: any iterable (list, generator, file reader)
+    :param chunk_size: maximum items in one chunk
+    """
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def response_ids(response: Dict[str, any], key: str) -> List[str]:
+    """ Get ids of the items inside response['data'][key]
+    :param response: response from Sertiva
+    :param key: name of the list in the data (recipients, credentials)
+    """
+    try:
+        return [item['id'] for item in response['data'][key]]
+    except (KeyError, TypeError):
+        raise SertipyException(None, f'response has no {key} ids', reason='unexpected response')
+
+
+def run_chunks(fn: Callable[[list], any], chunks: Iterable[list], workers: int = 4, max_pending: int = None,
+               skip: Iterable[int] = ()) -> Iterator[Tuple[int, list, any, Exception]]:
+    """ Call fn(chunk) for every chunk on a pool of workers
+    yield (index, chunk, result, error) in order of completion, error is None when fn succeeded
+    :param fn: function sending one chunk, e.g. lambda ids: sertiva.mains.verify(ids)
+    :param chunks: chunks to send, read only while less than max_pending are waiting
+    :param workers: parallel requests
+    :param max_pending: chunks allowed to wait for a worker, default 2 * workers
+    :param skip: index of chunks already done (resume from checkpoint)
+    """
+    max_pending = max_pending or 2 * workers
+    skip = set(skip)
+    chunks = ((index, chunk) for index, chunk in enumerate(chunks) if index not in skip)
+    pending = {}
+
+    with ThreadPoolExecutor(workers) as pool:
+        while True:
+            for index, chunk in itertools.islice(chunks, max_pending - len(pending)):
+                pending[pool.submit(fn, chunk)] = (index, chunk)
+
+            if not pending:
+                return
+
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index, chunk = pending.pop(future)
+                try:
+                    yield index, chunk, future.result(), None
+                except Exception as error:
+                    logger.error(f'[SERTIPY] Chunk {index} failed: {error}')
+                    yield index, chunk, None, error
+
+
+class PipelineSummary:
+    """
+    Result of running SertivaPipeline
+    errors: list of (stage, chunk index, exception), stage 'read' when the rows could not be read
+    failed_rows: rows of the chunks whose create or issue failed
+    """
+
+    def __init__(self):
+        self.template_id = None
+        self.chunks = 0
+        self.recipients_created = 0
+        self.recipient_ids = []
+        self.rejected = []
+        self.credentials_issued = 0
+        self.credential_ids = []
+        self.verified = []
+        self.errors = []
+        self.failed_rows = 0
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __repr__(self):
+        return (f'PipelineSummary(template_id={self.template_id!r}, chunks={self.chunks}, '
+                f'recipients_created={self.recipients_created}, rejected={len(self.rejected)}, '
+                f'credentials_issued={self.credentials_issued}, verified={len(self.verified)}, '
+                f'errors={len(self.errors)}, elapsed={self.elapsed:.2f}s)')
+
+
+class SertivaPipeline:
+    """
+    Chain template -> recipients -> issue -> verify with the stages overlapped.
+
+    Every chunk of recipients is sent to issuance as soon as it is accepted,
+    each stage has its own pool of workers and no new chunk is read while
+    max_pending chunks are still waiting in the create, issue or verify stage.
+
+    sertiva.pipeline(chunk_size=100) \\
+        .template('<design_id>', '<title>', '<description>') \\
+        .recipients(rows) \\
+        .issue('<issuance_date>', '<expiration_date>') \\
+        .verify(sample_size=1) \\
+        .run()
+    """
+
+    def __init__(self, sertiva, chunk_size: int = 100, create_workers: int = 4, issue_workers: int = 2,
+                 verify_workers: int = 1, max_pending: int = None):
+        """
+        :param sertiva: Sertiva client
+        :param chunk_size: recipients in one create/issue request
+        :param create_workers: parallel requests to create draft recipients
+        :param issue_workers: parallel requests to issue credentials
+        :param verify_workers: parallel requests to verify credentials
+        :param max_pending: chunks allowed to wait in each stage, default 2 * create_workers
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+
+        self.sertiva = sertiva
+        self.chunk_size = chunk_size
+        self.create_workers = create_workers
+        self.issue_workers = issue_workers
+        self.verify_workers = verify_workers
+        self.max_pending = max_pending or 2 * create_workers
+
+        self._template_id = None
+        self._template_data = None
+        self._rows = None
+        self._skip_chunks = set()
+        self._created = {}
+        self._issue_dates = None
+        self._verify_sample = 0
+        self._validate = False
+
+    def template(self, design_id: str, title: str, description: str):
+        """ Create a new template as the first stage
+        :param design_id: id from design
+        :param title: title template
+        :param description: description from template
+        """
+        self._template_data = (design_id, title, description)
+        self._template_id = None
+        return self
+
+    def use_template(self, template_id: str):
+        """ Use an existing template
+        :param template_id: id form template
+        """
+        self._template_id = template_id
+        self._template_data = None
+        return self
+
+    def recipients(self, rows: Iterable[dict], skip_chunks: Iterable[int] = (),
+                   created: Dict[int, List[str]] = None):
+        """ Draft recipients to create, read lazily chunk by chunk
+        :param rows: data recipient, same as recipients.create
+        :param skip_chunks: index of chunks already done (resume from checkpoint)
+        :param created: recipient ids of chunks already created but not issued (resume from checkpoint),
+            these chunks are issued without creating the recipients again
+        """
+        self._rows = rows
+        self._skip_chunks = set(skip_chunks)
+        self._created = dict(created or {})
+        return self
+
+    def validate(self):
+        """ Check every chunk with the template fields and send only the valid rows,
+        invalid rows are kept in summary.rejected as (index, row, errors)
+        """
+        self._validate = True
+        return self
+
+    def issue(self, issuance_date: str, expiration_date: str):
+        """ Issue credentials for every chunk of created recipients
+        :param issuance_date: Credential/Certificate issuance date
+        :param expiration_date: Credential/Certificate expiration date
+        """
+        self._issue_dates = (issuance_date, expiration_date)
+        return self
+
+    def verify(self, sample_size: int = 1):
+        """ Spot-check credentials of every issued chunk
+        :param sample_size: credential ids verified from each issued chunk
+        """
+        self._verify_sample = sample_size
+        return self
+
+    def run(self, on_chunk: Callable[[int, PipelineSummary], None] = None,
+            on_created: Callable[[int, List[str]], None] = None) -> PipelineSummary:
+        """ Run the stages and return PipelineSummary
+        :param on_chunk: called with (index, summary) when a chunk is created and issued (progress, checkpoint)
+        :param on_created: called with (index, recipient ids) when the recipients of a chunk are created
+        """
+        summary = PipelineSummary()
+        started = time.monotonic()
+
+        summary.template_id = self._resolve_template()
+
+        if self._rows is None:
+            summary.elapsed = time.monotonic() - started
+            return summary
+
+        with ThreadPoolExecutor(self.create_workers) as create_pool, \
+                ThreadPoolExecutor(self.issue_workers) as issue_pool, \
+                ThreadPoolExecutor(self.verify_workers) as verify_pool:
+            self._run_stages(summary, create_pool, issue_pool, verify_pool, on_chunk, on_created)
+
+        summary.elapsed = time.monotonic() - started
+        logger.info(f'[SERTIPY] Pipeline finished {summary!r}')
+
+        return summary
+
+    def _resolve_template(self) -> str:
+        if self._template_data:
+            logger.debug('[SERTIPY] Pipeline creating template')
+            response = self.sertiva.templates.create(*self._template_data)
+            self._template_id = response['data']['id']
+
+        if not self._template_id:
+            raise ValueError('pipeline needs template() or use_template() before run()')
+
+        return self._template_id
+
+    def _run_stages(self, summary, create_pool, issue_pool, verify_pool, on_chunk, on_created):
+        template_id = self._template_id
+        validator = self.sertiva.validators.get(template_id) if self._validate else None
+        chunks = enumerate(chunked(self._rows, self.chunk_size))
+        stages = {}
+        exhausted = False
+        read = 0
+
+        while True:
+            # backpressure, read the next chunk only when every stage has room
+            while not exhausted and all(self._pending(stages, stage) < self.max_pending
+                                        for stage in ('create', 'issue', 'verify')):
+                try:
+                    index, chunk = next(chunks, (None, None))
+                except Exception as error:
+                    # e.g. a bad line in the input, the chunks already sent are finished
+                    logger.error(f'[SERTIPY] Pipeline failed to read chunk {read}: {error}')
+                    summary.errors.append(('read', read, error))
+                    exhausted = True
+                    break
+                if chunk is None:
+                    exhausted = True
+                    break
+                read += 1
+                if index in self._skip_chunks:
+                    continue
+                summary.chunks += 1
+
+                if index in self._created:
+                    # created by a previous run, only the issue is left
+                    if self._issue_dates and self._created[index]:
+                        future = issue_pool.submit(self.sertiva.mains.issue, template_id, *self._issue_dates,
+                                                   recipient_ids=self._created[index])
+                        stages[future] = ('issue', index, len(self._created[index]))
+                    elif on_chunk:
+                        on_chunk(index, summary)
+                    continue
+
+                if validator:
+                    result = validator.partition(chunk)
+                    first = index * self.chunk_size
+                    summary.rejected.extend((first + x, row, errors) for x, row, errors in result.invalid)
+                    chunk = result.valid
+                    if not chunk:
+                        if on_chunk:
+                            on_chunk(index, summary)
+                        continue
+
+                future = create_pool.submit(self.sertiva.recipients.create, template_id, chunk)
+                stages[future] = ('create', index, len(chunk))
+
+            if not stages:
+                return
+
+            done, _ = wait(list(stages), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, index, rows = stages.pop(future)
+                try:
+                    response = future.result()
+                    if stage == 'create':
+                        ids = response_ids(response, 'recipients')
+                    elif stage == 'issue':
+                        ids = response_ids(response, 'credentials')
+                except Exception as error:
+                    logger.error(f'[SERTIPY] Pipeline {stage} stage failed: {error}')
+                    summary.errors.append((stage, index, error))
+                    if stage != 'verify':
+                        summary.failed_rows += rows
+                    continue
+
+                if stage == 'create':
+                    summary.recipients_created += len(ids)
+                    summary.recipient_ids.extend(ids)
+                    if on_created:
+                        on_created(index, ids)
+                    if self._issue_dates and ids:
+                        future = issue_pool.submit(self.sertiva.mains.issue, template_id, *self._issue_dates,
+                                                   recipient_ids=ids)
+                        stages[future] = ('issue', index, len(ids))
+                    elif on_chunk:
+                        on_chunk(index, summary)
+
+                elif stage == 'issue':
+                    summary.credentials_issued += len(ids)
+                    summary.credential_ids.extend(ids)
+                    if on_chunk:
+                        on_chunk(index, summary)
+                    if self._verify_sample and ids:
+                        sample = random.sample(ids, min(self._verify_sample, len(ids)))
+                        future = verify_pool.submit(self.sertiva.mains.verify, sample)
+                        stages[future] = ('verify', index, len(sample))
+
+                else:
+                    summary.verified.extend(response['data'])
+
+    @staticmethod
+    def _pending(stages: dict, stage: str) -> int:
+        return sum(1 for value, _, _ in stages.values() if value == stage)
@@ -0,0 +1,28 @@
+__all__ = ['RateLimiter']
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Spread requests to at most `rate` per second, shared by all threads
+    """
+
+    def __init__(self, rate: float):
+        if rate <= 0:
+            raise ValueError('rate must be greater than 0')
+
+        self.interval = 1.0 / rate
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """ Block until the caller may send the next request """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,264 @@
+"""
+Record Sertiva traffic and replay it offline for profiling and load tests
+
+    # record anonymised request/response pairs while using the client
+    sertiva = Sertiva(client_id, client_secret, transport=RecordingTransport('traffic.jsonl'))
+
+    # serve them back with the recorded latency, 10 times faster
+    sertiva = Sertiva('', '', transport=ReplayTransport('traffic.jsonl', speed=10))
+    report = load_test(lambda i: sertiva.credentials.list(), total=10000, concurrency=50)
+"""
+
+__all__ = ['RecordingTransport', 'ReplayTransport', 'LoadReport', 'load_test', 'anonymise']
+
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+
+from sertipy.transport import RequestsTransport
+
+logger = logging.getLogger(__name__)
+
+UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+VERSION_PATTERN = re.compile(r'^v\d+$')
+
+# values of these keys are kept (status, paging and token type), every other string and number is masked
+STRUCTURAL_KEYS = {'status', 'code', 'type', 'token_type', 'expires_in',
+                   'page', 'current_page', 'last_page', 'total_pages', 'total_page', 'per_page'}
+
+
+def normalise_path(url: str) -> str:
+    """ Path of the url with ids replaced, after the api version the path alternates
+    collection and id: /api/v2/templates/<id>/recipients -> /api/v2/templates/{id}/recipients
+    """
+    segments = urlparse(url).path.split('/')
+    versions = [index for index, segment in enumerate(segments) if VERSION_PATTERN.match(segment)]
+    first = versions[0] + 1 if versions else 1
+
+    for index in range(first + 1, len(segments), 2):
+        if segments[index]:
+            segments[index] = '{id}'
+
+    return UUID_PATTERN.sub('{id}', '/'.join(segments))
+
+
+def mask_number(number):
+    """ Number with the same sign and digits count, 3201010101 -> 1111111111, 12.75 -> 11.11 """
+    mantissa, separator, exponent = repr(number).partition('e')
+    masked = re.sub(r'\d', '1', mantissa) + separator + exponent
+
+    return type(number)(masked) if isinstance(number, float) else int(masked)
+
+
+def anonymise(value, ids: Dict[str, str] = None):
+    """ Copy of a response body without personal data, sizes are kept.
+    Every string is replaced by 'x' of the same length and every number by one with the same
+    digits count, except the values of STRUCTURAL_KEYS. uuids inside the strings are replaced by fake uuids.
+    :param value: decoded json
+    :param ids: mapping of real to fake uuid, the same id is replaced by the same fake id
+    """
+    ids = {} if ids is None else ids
+
+    def mask(text: str) -> str:
+        parts = []
+        last = 0
+        for match in UUID_PATTERN.finditer(text):
+            parts.append('x' * (match.start() - last))
+            parts.append(ids.setdefault(match.group(0), str(uuid.uuid4())))
+            last = match.end()
+        parts.append('x' * (len(text) - last))
+        return ''.join(parts)
+
+    def walk(item, key=None):
+        if isinstance(item, dict):
+            return {k: walk(v, k) for k, v in item.items()}
+        if isinstance(item, list):
+            return [walk(v, key) for v in item]
+        if key in STRUCTURAL_KEYS or isinstance(item, bool):
+            return item
+        if isinstance(item, str):
+            return mask(item)
+        if isinstance(item, (int, float)):
+            return mask_number(item)
+        return item
+
+    return walk(value)
+
+
+class RecordingTransport:
+    """
+    Wrap a transport and append every anonymised request/response pair to a jsonl file:
+    method, path, params, status, latency and sizes. Headers and request bodies are never written.
+    """
+
+    def __init__(self, path: str, transport=None):
+        self.path = path
+        self.transport = transport or RequestsTransport()
+        self._ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def offline(self) -> bool:
+        return getattr(self.transport, 'offline', False)
+
+    def __call__(self, method: str, url: str, headers: Dict[str, str] = None, params: dict = None,
+                 payload=None, stream: bool = False):
+        started = time.monotonic()
+        response = self.transport(method, url, headers=headers, params=params, payload=payload, stream=stream)
+        elapsed = time.monotonic() - started
+
+        # the body is read to record it, a streamed response is buffered while recording
+        content = response.content
+        try:
+            body = json.loads(content)
+        except ValueError:
+            body = None
+
+        with self._lock:
+            entry = {
+                "method": method,
+                "path": normalise_path(url),
+                "params": anonymise(params or {}, self._ids),
+                "status": response.status_code,
+                "reason": response.reason,
+                "elapsed": round(elapsed, 6),
+                "request_size": len(json.dumps(payload)) if payload is not None else 0,
+                "response_size": len(content),
+                "body": anonymise(body, self._ids),
+            }
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+        return response
+
+
+class ReplayTransport:
+    """
+    Serve recorded responses without network. Requests are matched by method and path (ids ignored),
+    the recorded responses of a path are returned in turn and the latency is drawn from the latencies
+    recorded for that path, divided by `speed`.
+    The client keeps the token in memory with this transport, the authorization is answered
+    with a fake token when it was not recorded.
+    """
+
+    offline = True
+
+    def __init__(self, path: str, speed: float = 1.0, latency: bool = True, seed: int = None):
+        """
+        :param path: jsonl file written by RecordingTransport
+        :param speed: 10 replays ten times faster than recorded
+        :param latency: False to answer without waiting
+        :param seed: seed of the latency sampling
+        """
+        self.speed = speed
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, List[dict]] = {}
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault((entry['method'], entry['path']), []).append(entry)
+
+        self._cycles = {key: itertools.cycle(entries) for key, entries in self._entries.items()}
+        logger.info(f'[SERTIPY] Replay {sum(map(len, self._entries.values()))} recorded responses from {path}')
+
+    def __call__(self, method: str, url: str, headers: Dict[str, str] = None, params: dict = None,
+                 payload=None, stream: bool = False):
+        key = (method, normalise_path(url))
+
+        with self._lock:
+            if key not in self._cycles:
+                entry, elapsed = None, 0.0
+            else:
+                entry = next(self._cycles[key])
+                elapsed = self._random.choice(self._entries[key])['elapsed']
+
+        if self.latency and elapsed:
+            time.sleep(elapsed / self.speed)
+
+        if entry is None and key[1].endswith('/authorization'):
+            return self._response(url, 200, 'OK', {"data": {"token_type": "Bearer", "access_token": 'x' * 32}})
+
+        if entry is None:
+            logger.warning(f'[SERTIPY] No recorded response for {method} {key[1]}')
+            return self._response(url, 404, 'Not Found',
+                                  {"message": f'no recorded response for {method} {key[1]}'})
+
+        return self._response(url, entry['status'], entry['reason'], entry['body'])
+
+    @staticmethod
+    def _response(url: str, status: int, reason: str, body):
+        import requests
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(body).encode('utf-8')
+        response._content_consumed = True
+
+        return response
+
+
+class LoadReport:
+    """
+    Latency and throughput of load_test
+    """
+
+    def __init__(self, latencies: List[float], errors: int, elapsed: float):
+        self.latencies = sorted(latencies)
+        self.count = len(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+        self.throughput = self.count / elapsed if elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        return self.latencies[min(int(p / 100 * self.count), self.count - 1)]
+
+    def __repr__(self):
+        return (f'LoadReport(count={self.count}, errors={self.errors}, throughput={self.throughput:.1f}/s, '
+                f'p50={self.percentile(50) * 1000:.1f}ms, p95={self.percentile(95) * 1000:.1f}ms, '
+                f'p99={self.percentile(99) * 1000:.1f}ms)')
+
+
+def load_test(fn: Callable[[int], any], total: int, concurrency: int = 10) -> LoadReport:
+    """ Call fn(i) total times from `concurrency` threads and measure every call
+    :param fn: one unit of work, e.g. lambda i: sertiva.credentials.detail(ids[i % len(ids)])
+    :param total: number of calls
+    :param concurrency: parallel calls
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    errors = [0]
+    lock = threading.Lock()
+
+    def timed(i):
+        started = time.monotonic()
+        try:
+            fn(i)
+        except Exception as error:
+            logger.debug(f'[SERTIPY] Load test call {i} failed: {error}')
+            with lock:
+                errors[0] += 1
+        return time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed, range(total)))
+
+    return LoadReport(latencies, errors[0], time.monotonic() - started)
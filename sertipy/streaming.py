@@ -0,0 +1,131 @@
+__all__ = ['iter_items', 'DEFAULT_MAX_BUFFER_SIZE']
+
+import codecs
+import json
+
+from typing import Iterable, Iterator, Sequence
+
+from sertipy.exceptions import SertipyException
+
+DEFAULT_MAX_BUFFER_SIZE = 8 * 1024 * 1024
+
+WHITESPACE = ' \t\n\r'
+
+# characters which may continue a number split at the end of a chunk
+NUMBER_CONTINUATION = '.eE+-0123456789'
+
+
+class _Reader:
+    """
+    Text of a response read chunk by chunk, only the part not parsed yet is kept
+    """
+
+    def __init__(self, chunks: Iterable[bytes], max_buffer_size: int):
+        self.chunks = iter(chunks)
+        self.max_buffer_size = max_buffer_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """ Read the next chunk, return False at the end of the body """
+        if self.eof:
+            return False
+
+        chunk = next(self.chunks, None)
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+
+        if chunk is None:
+            self.buffer += self.decoder.decode(b'', final=True)
+            self.eof = True
+            return False
+
+        self.buffer += self.decoder.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """ Next character which is not whitespace, '' at the end of the body """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def take(self, expected: str) -> str:
+        char = self.peek()
+        if char not in expected or not char:
+            raise SertipyException(None, f'expected {expected!r} in response, found {char!r}',
+                                   reason='unexpected response')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """ Decode the next json value, reading more chunks until it is complete """
+        self.peek()
+        while True:
+            start = self.pos
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, start)
+                if end - start > self.max_buffer_size:
+                    self._too_large()
+                if self.eof or not self._may_continue(value, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise SertipyException(None, 'response is not valid json', reason='unexpected response')
+
+            # the value is incomplete, everything after its start belongs to it
+            if len(self.buffer) - start > self.max_buffer_size:
+                self._too_large()
+            self.fill()
+
+    def _may_continue(self, value, end: int) -> bool:
+        """ A number at the end of the buffer (2. | 5, 1e | 3) may continue in the next chunk """
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return end == len(self.buffer) or self.buffer[end] in NUMBER_CONTINUATION
+
+    def _too_large(self):
+        raise SertipyException(None, f'streamed item is larger than {self.max_buffer_size} characters',
+                               reason='response too large')
+
+
+def iter_items(chunks: Iterable[bytes], path: Sequence[str], max_buffer_size: int = DEFAULT_MAX_BUFFER_SIZE) \
+        -> Iterator[any]:
+    """ Yield the items of the json array at `path` while the body is read
+    e.g. path ('data', 'credentials') yields every credential of {"data": {"credentials": [...]}}.
+    Only one item (and the values skipped on the way to the array) is kept in memory.
+    :param chunks: bytes of the body, e.g. response.iter_content(chunk_size)
+    :param path: keys of the objects around the array
+    :param max_buffer_size: maximum characters buffered for one item, SertipyException when exceeded
+    """
+    reader = _Reader(chunks, max_buffer_size)
+
+    for key in path:
+        reader.take('{')
+        while True:
+            if reader.peek() == '}':
+                raise SertipyException(None, f'response has no {".".join(path)} array',
+                                       reason='unexpected response')
+            name = reader.value()
+            reader.take(':')
+            if name == key:
+                break
+            reader.value()
+            if reader.peek() == ',':
+                reader.take(',')
+
+    reader.take('[')
+    if reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.value()
+        if reader.take(',]') == ']':
+            return
@@ -0,0 +1,27 @@
+__all__ = ['RequestsTransport']
+
+import logging
+
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class RequestsTransport:
+    """
+    Send a request with the requests library and return the requests.Response.
+    A transport is any callable with this signature, e.g. the recording and replay
+    transports of sertipy.replay wrap or replace this one.
+    """
+
+    allowed_methods = ('GET', 'POST', 'PATCH', 'DELETE')
+
+    def __call__(self, method: str, url: str, headers: Dict[str, str] = None, params: dict = None,
+                 payload=None, stream: bool = False):
+        # requests is imported on the first call to keep `import sertipy` fast
+        import requests
+
+        if method not in self.allowed_methods:
+            raise KeyError(method)
+
+        return requests.request(method, url, headers=headers, params=params or None, json=payload, stream=stream)
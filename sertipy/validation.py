@@ -0,0 +1,217 @@
+__all__ = ['RecipientValidator', 'TemplateValidators', 'ValidationResult']
+
+import logging
+import math
+import re
+import threading
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+INTEGER_PATTERN = re.compile(r'^[+-]?\d+$')
+
+
+def _is_text(value) -> bool:
+    return isinstance(value, str)
+
+
+def _is_number(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    if not isinstance(value, float):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+    return math.isfinite(value)
+
+
+def _is_integer(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    if isinstance(value, float):
+        return value.is_integer()
+    return isinstance(value, str) and bool(INTEGER_PATTERN.match(value.strip()))
+
+
+def _is_date(value) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value[:-1] if value.endswith('Z') else value)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_email(value) -> bool:
+    return isinstance(value, str) and bool(EMAIL_PATTERN.match(value))
+
+
+TYPE_CHECKS: Dict[str, Callable[[any], bool]] = {
+    'text': _is_text,
+    'string': _is_text,
+    'number': _is_number,
+    'integer': _is_integer,
+    'date': _is_date,
+    'datetime': _is_date,
+    'email': _is_email,
+}
+
+
+def schema_fields(template: dict) -> List[dict]:
+    """ Get the field definitions from the data of a template or design detail
+    a field is {"name": "credentialSubject.activityDate", "type": "date", "required": true},
+    `key` is accepted instead of `name`
+    """
+    fields = template.get('fields')
+    if fields is None and isinstance(template.get('design'), dict):
+        fields = template['design'].get('fields')
+
+    if isinstance(fields, dict):
+        # {"credentialSubject.activityDate": {"type": "date"}}
+        fields = [dict(definition, name=name) for name, definition in fields.items()]
+
+    return fields or []
+
+
+class ValidationResult:
+    """
+    Rows split by RecipientValidator.partition
+    invalid: list of (index, row, errors)
+    """
+
+    def __init__(self):
+        self.valid: List[dict] = []
+        self.invalid: List[Tuple[int, dict, List[str]]] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.invalid
+
+
+class RecipientValidator:
+    """
+    Checks of the template fields compiled once, run on recipient rows before upload
+    """
+
+    def __init__(self, fields: Iterable[dict]):
+        self.checks = []
+
+        for field in fields:
+            name = field.get('name') or field.get('key')
+            if not name:
+                continue
+            field_type = str(field.get('type') or '').lower()
+            self.checks.append((name, tuple(name.split('.')), bool(field.get('required')),
+                                TYPE_CHECKS.get(field_type), field_type))
+
+    def validate(self, row: dict) -> List[str]:
+        """ Return errors of one recipient row, empty when the row is valid """
+        if not isinstance(row, dict):
+            return ['recipient must be an object']
+
+        errors = []
+
+        name = row.get('name')
+        if name is not None and not (isinstance(name, str) and name.strip()):
+            errors.append('name must be a non empty text')
+
+        email = row.get('email')
+        if email is not None and not _is_email(email):
+            errors.append(f'email {email!r} is not valid')
+
+        fields = row.get('fields') or {}
+
+        for name, path, required, check, field_type in self.checks:
+            value = fields
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+
+            if value is None or value == '':
+                if required:
+                    errors.append(f'fields.{name} is required')
+            elif check and not check(value):
+                errors.append(f'fields.{name} must be {field_type}')
+
+        return errors
+
+    def partition(self, rows: Iterable[dict]) -> ValidationResult:
+        """ Validate rows in one pass and split them into valid and invalid """
+        result = ValidationResult()
+        validate = self.validate
+
+        for index, row in enumerate(rows):
+            errors = validate(row)
+            if errors:
+                result.invalid.append((index, row, errors))
+            else:
+                result.valid.append(row)
+
+        return result
+
+
+class TemplateValidators:
+    """
+    RecipientValidator compiled from the template (or its design) fields, cached per template id
+    """
+
+    def __init__(self, templates, designs):
+        self.templates = templates
+        self.designs = designs
+        self._validators: Dict[str, RecipientValidator] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_id: str) -> RecipientValidator:
+        """ Return the validator of the template, the schema is fetched only on the first call
+        :param template_id: id form template
+        """
+        template_id = str(template_id)
+        validator = self._validators.get(template_id)
+
+        if validator:
+            return validator
+
+        # the schema of one template is fetched once, other templates are not blocked meanwhile
+        with self._lock:
+            lock = self._locks.setdefault(template_id, threading.Lock())
+
+        with lock:
+            validator = self._validators.get(template_id)
+            if validator is None:
+                validator = RecipientValidator(self._fetch_fields(template_id))
+                self._validators[template_id] = validator
+
+        return validator
+
+    def clear(self, template_id: str = None) -> None:
+        """ Forget a compiled validator, e.g. after the template is updated """
+        with self._lock:
+            if template_id is None:
+                self._validators.clear()
+                self._locks.clear()
+            else:
+                self._validators.pop(str(template_id), None)
+                self._locks.pop(str(template_id), None)
+
+    def _fetch_fields(self, template_id: str) -> List[dict]:
+        logger.debug(f'[SERTIPY] Fetching fields of template {template_id}')
+        template = self.templates.detail(template_id)['data']
+        fields = schema_fields(template)
+
+        if not fields and template.get('design_id'):
+            fields = schema_fields(self.designs.detail(template['design_id'])['data'])
+
+        if not fields:
+            logger.warning(f'[SERTIPY] No fields found for template {template_id}, '
+                           f'only name and email of the recipients are validated')
+
+        return fields
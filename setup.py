@@ -21,6 +21,9 @@ setup(
         "Operating System :: OS Independent",
     ],
     install_requires=['requests'],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     packages=['sertipy'],
+    entry_points={
+        'console_scripts': ['sertipy=sertipy.cli:main'],
+    },
 )
@@ -0,0 +1,28 @@
+"""
+Callbacks answering like Sertiva for `responses.add_callback`
+"""
+
+import json
+import uuid
+
+
+def success(data) -> tuple:
+    return 200, {}, json.dumps({"code": 200, "status": "success", "data": data})
+
+
+def create_recipients(request) -> tuple:
+    """ Echo the recipients with a new id each """
+    recipients = json.loads(request.body)['recipients']
+    return success({"recipients": [dict(recipient, id=str(uuid.uuid4())) for recipient in recipients]})
+
+
+def issue_credentials(request) -> tuple:
+    """ One credential 'credential-<recipient id>' for each recipient id """
+    recipient_ids = json.loads(request.body)['recipient_ids']
+    return success({"credentials": [{"id": f'credential-{x}'} for x in recipient_ids]})
+
+
+def verify_credentials(request) -> tuple:
+    """ Every credential is valid """
+    credential_ids = json.loads(request.body)['credential_ids']
+    return success([{"id": x, "verification": []} for x in credential_ids])
@@ -0,0 +1,353 @@
+import io
+import json
+import os
+import tempfile
+import uuid
+
+import responses
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import TestCase
+from urllib.parse import parse_qs, urlparse
+
+from sertipy.cli import main, read_rows
+from tests.unit.fake_api import create_recipients, issue_credentials, success, verify_credentials
+
+ISSUE_URL = 'https://api.sertiva.id/api/v2/issue'
+VERIFY_URL = 'https://api.sertiva.id/api/v2/verify'
+
+
+class TestCli(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        # token is taken from the cache file in the working directory
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        with open('.cache', 'w') as f:
+            f.write(json.dumps('ACCESS TOKEN'))
+
+        self.responses = responses.RequestsMock(assert_all_requests_are_fired=False)
+        self.responses.start()
+        self.addCleanup(self.responses.stop)
+        self.addCleanup(self.responses.reset)
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def run_cli(self, *argv: str):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            code = main(['--client-id', 'id', '--client-secret', 'secret', *argv])
+        return code, stdout.getvalue(), stderr.getvalue()
+
+
+class TestReadRows(TestCli):
+    def test_read_csv(self):
+        # given
+        path = self.write('recipients.csv', 'name,email,fields.credentialSubject.activityDate\n'
+                                            'John Doe,john@doe.com,2021-05-01\n')
+
+        # then
+        self.assertEqual(list(read_rows(path)), [{
+            "name": "John Doe",
+            "email": "john@doe.com",
+            "fields": {"credentialSubject": {"activityDate": "2021-05-01"}}
+        }])
+
+
+class TestIssue(TestCli):
+    def test_issue(self):
+        # given
+        template_id = str(uuid.uuid4())
+        path = self.write('recipients.jsonl', ''.join(json.dumps({"name": f"r{x}"}) + '\n' for x in range(5)))
+
+        self.responses.add_callback(
+            responses.POST, f'https://api.sertiva.id/api/v2/templates/{template_id}/recipients',
+            callback=create_recipients)
+        self.responses.add_callback(responses.POST, ISSUE_URL, callback=issue_credentials)
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '2', 'issue', template_id, path,
+                                       '--issuance-date', '2021-05-01', '--expiration-date', '2022-05-01')
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertIn('issued 5 rows, 0 failed', stderr)
+        self.assertEqual(len(self.responses.calls), 6)
+
+    def test_issue_resume_does_not_create_again(self):
+        # given, the first run creates both chunks and fails to issue
+        template_id = str(uuid.uuid4())
+        path = self.write('recipients.jsonl', ''.join(json.dumps({"name": f"r{x}"}) + '\n' for x in range(4)))
+        checkpoint = os.path.join(self.tmp.name, 'issue.ckpt')
+        argv = ['--chunk-size', '2', '--checkpoint', checkpoint, 'issue', template_id, path,
+                '--issuance-date', '2021-05-01', '--expiration-date', '2022-05-01']
+
+        create_url = f'https://api.sertiva.id/api/v2/templates/{template_id}/recipients'
+        self.responses.add_callback(responses.POST, create_url, callback=create_recipients)
+        self.responses.add(
+            responses.POST, 'https://api.sertiva.id/api/v2/issue',
+            body=f'{json.dumps({"code": 500, "status": "fail", "message": "down"})}',
+            status=500,
+            content_type='application/json')
+        code, _, stderr = self.run_cli(*argv)
+        self.assertEqual(code, 1)
+        self.assertIn('issued 0 rows, 4 failed', stderr)
+
+        # when, the second run can issue
+        self.responses.calls.reset()
+        self.responses.remove(responses.POST, 'https://api.sertiva.id/api/v2/issue')
+        self.responses.add_callback(responses.POST, ISSUE_URL, callback=issue_credentials)
+        code, _, stderr = self.run_cli(*argv)
+
+        # then, recipients are only issued
+        self.assertEqual(code, 0)
+        self.assertIn('issued 4 rows', stderr)
+        self.assertEqual([call.request.url for call in self.responses.calls],
+                         ['https://api.sertiva.id/api/v2/issue'] * 2)
+
+
+    def test_issue_bad_line_keeps_summary(self):
+        # given, the third chunk has a line which is not json
+        template_id = str(uuid.uuid4())
+        lines = [json.dumps({"name": f"r{x}"}) for x in range(4)] + ['{"name": "r4"', json.dumps({"name": "r5"})]
+        path = self.write('recipients.jsonl', '\n'.join(lines) + '\n')
+        self.responses.add_callback(
+            responses.POST, f'https://api.sertiva.id/api/v2/templates/{template_id}/recipients',
+            callback=create_recipients)
+        self.responses.add_callback(responses.POST, ISSUE_URL, callback=issue_credentials)
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '2', 'issue', template_id, path,
+                                       '--issuance-date', '2021-05-01', '--expiration-date', '2022-05-01')
+
+        # then, the chunks before the bad line are issued
+        self.assertEqual(code, 1)
+        self.assertIn('issued 4 rows', stderr)
+        self.assertIn('chunk 2 read failed', stderr)
+        self.assertIn('recipients.jsonl line 5 is not valid json', stderr)
+
+
+class TestVerify(TestCli):
+    def test_verify_writes_results(self):
+        # given
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        path = self.write('ids.txt', '\n'.join(ids))
+        self.responses.add_callback(responses.POST, VERIFY_URL, callback=verify_credentials)
+
+        # when
+        code, stdout, stderr = self.run_cli('--chunk-size', '2', 'verify', path)
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertIn('verified 3 rows, 0 failed', stderr)
+        self.assertCountEqual([json.loads(line)['id'] for line in stdout.splitlines()], ids)
+
+    def test_verify_reports_invalid_credentials(self):
+        # given
+        path = self.write('ids.txt', 'a\nb')
+        self.responses.add_callback(responses.POST, VERIFY_URL, callback=lambda request: success([
+            {"id": "a", "valid": False, "revoked": True}, {"id": "b", "valid": True}]))
+        output = os.path.join(self.tmp.name, 'results.jsonl')
+
+        # when
+        code, _, stderr = self.run_cli('verify', path, '--output', output)
+
+        # then
+        self.assertEqual(code, 3)
+        self.assertIn('1 credentials are not valid', stderr)
+        with open(output) as f:
+            self.assertEqual([json.loads(line)['id'] for line in f], ['a', 'b'])
+
+    def test_verify_resume_from_checkpoint(self):
+        # given
+        ids = [str(uuid.uuid4()) for _ in range(5)]
+        path = self.write('ids.txt', '\n'.join(ids))
+        # the last line was cut off when the previous run stopped
+        checkpoint = self.write('checkpoint.jsonl', json.dumps({"command": "verify", "chunk_size": 2}) + '\n' +
+                                json.dumps({"chunk": 0, "stage": "done"}) + '\n' + '{"chunk": 1, "sta')
+
+        self.responses.add(
+            responses.POST, 'https://api.sertiva.id/api/v2/verify',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": []})}',
+            status=200,
+            content_type='application/json')
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '2', '--checkpoint', checkpoint, 'verify', path)
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertIn('verified 3 rows', stderr)
+        sent = [json.loads(call.request.body)['credential_ids'] for call in self.responses.calls]
+        self.assertCountEqual(sent, [ids[2:4], ids[4:]])
+        with open(checkpoint) as f:
+            self.assertEqual(sorted(json.loads(line)['chunk'] for line in f.readlines()[1:]), [0, 1, 2])
+
+    def test_checkpoint_chunk_size_mismatch(self):
+        # given
+        path = self.write('ids.txt', str(uuid.uuid4()))
+        checkpoint = self.write('checkpoint.jsonl', json.dumps({"command": "verify", "chunk_size": 100}) + '\n')
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '2', '--checkpoint', checkpoint, 'verify', path)
+
+        # then
+        self.assertEqual(code, 1)
+        self.assertIn('checkpoint mismatch', stderr)
+        self.assertEqual(len(self.responses.calls), 0)
+
+    def test_checkpoint_command_mismatch(self):
+        # given, a checkpoint of a verify run
+        path = self.write('ids.txt', str(uuid.uuid4()))
+        checkpoint = self.write('checkpoint.jsonl', json.dumps({"command": "verify", "chunk_size": 100}) + '\n')
+
+        # when
+        code, _, stderr = self.run_cli('--checkpoint', checkpoint, 'revoke', path, '--reason', 'wrong')
+
+        # then
+        self.assertEqual(code, 1)
+        self.assertIn('written by verify', stderr)
+        self.assertEqual(len(self.responses.calls), 0)
+
+    def test_missing_file(self):
+        # when
+        code, _, stderr = self.run_cli('verify', 'missing.txt')
+
+        # then
+        self.assertEqual(code, 2)
+        self.assertIn('sertipy: missing.txt is not a file', stderr)
+
+
+class TestRevoke(TestCli):
+    def test_revoke(self):
+        # given
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        path = self.write('ids.txt', '\n'.join(ids))
+
+        self.responses.add(
+            responses.DELETE, 'https://api.sertiva.id/api/v2/revoke',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": []})}',
+            status=200,
+            content_type='application/json')
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '2', 'revoke', path, '--reason', 'wrong certificate')
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertIn('revoked 3 rows, 0 failed', stderr)
+        sent = [json.loads(call.request.body) for call in self.responses.calls]
+        self.assertCountEqual([body['credential_ids'] for body in sent], [ids[:2], ids[2:]])
+        self.assertEqual({body['reason'] for body in sent}, {'wrong certificate'})
+
+
+class TestSync(TestCli):
+    def setUp(self) -> None:
+        super().setUp()
+        self.template_id = str(uuid.uuid4())
+        self.url = f'https://api.sertiva.id/api/v2/templates/{self.template_id}/recipients'
+        self.existing = [str(uuid.uuid4()) for _ in range(3)]
+
+        def list_recipients(request):
+            return success({"recipients": [{"id": x} for x in self.existing], "meta": {"last_page": 1}})
+
+        self.responses.add_callback(responses.POST, self.url, callback=create_recipients)
+        self.responses.add_callback(responses.GET, self.url, callback=list_recipients)
+        self.responses.add_callback(responses.PATCH, self.url, callback=lambda request: success([]))
+        self.responses.add_callback(responses.DELETE, self.url, callback=lambda request: success([]))
+
+    def sent(self, method: str) -> list:
+        return [json.loads(call.request.body) for call in self.responses.calls if call.request.method == method]
+
+    def test_sync(self):
+        # given, the first row updates an existing recipient and the others are new
+        rows = [{"id": self.existing[0], "name": "r0"}] + [{"name": f"r{x}"} for x in range(1, 4)]
+        path = self.write('recipients.jsonl', ''.join(json.dumps(row) + '\n' for row in rows))
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '2', 'sync', self.template_id, path)
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertIn('synced 4 rows, 0 failed', stderr)
+        self.assertEqual(self.sent('PATCH'), [{"recipients": [rows[0]]}])
+        self.assertCountEqual([body['recipients'] for body in self.sent('POST')], [[rows[1]], rows[2:]])
+        self.assertEqual(self.sent('DELETE'), [])
+
+    def test_sync_bad_line(self):
+        # given
+        path = self.write('recipients.jsonl', '{"name": "r0"\n')
+
+        # when
+        code, _, stderr = self.run_cli('sync', self.template_id, path)
+
+        # then
+        self.assertEqual(code, 2)
+        self.assertIn('line 1 is not valid json', stderr)
+        self.assertEqual(self.sent('POST'), [])
+
+    def test_sync_delete_missing(self):
+        # given
+        path = self.write('recipients.jsonl', json.dumps({"id": self.existing[0], "name": "r0"}) + '\n' +
+                          json.dumps({"name": "r1"}) + '\n')
+
+        # when
+        code, _, _ = self.run_cli('sync', self.template_id, path, '--delete-missing')
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertEqual(self.sent('DELETE'), [{"recipient_ids": self.existing[1:]}])
+
+    def test_sync_resume_keeps_created_recipients(self):
+        # given, chunk 0 was synced by a previous run which created existing[1]
+        path = self.write('recipients.jsonl', ''.join(json.dumps({"name": f"r{x}"}) + '\n' for x in range(2)))
+        checkpoint = self.write('sync.ckpt', json.dumps({"command": "sync", "chunk_size": 1}) + '\n' +
+                                json.dumps({"chunk": 0, "stage": "done", "ids": [self.existing[1]]}) + '\n')
+
+        # when
+        code, _, stderr = self.run_cli('--chunk-size', '1', '--checkpoint', checkpoint,
+                                       'sync', self.template_id, path, '--delete-missing')
+
+        # then, only the second row is created and neither created recipient is deleted
+        self.assertEqual(code, 0)
+        self.assertEqual([body['recipients'] for body in self.sent('POST')], [[{"name": "r1"}]])
+        deleted = [x for body in self.sent('DELETE') for x in body['recipient_ids']]
+        self.assertCountEqual(deleted, [self.existing[0], self.existing[2]])
+
+
+class TestExport(TestCli):
+    def test_export_rejects_checkpoint(self):
+        # when
+        code, _, stderr = self.run_cli('--checkpoint', 'export.ckpt', 'export', 'credentials')
+
+        # then
+        self.assertEqual(code, 2)
+        self.assertIn('--checkpoint is not supported by export', stderr)
+        self.assertEqual(len(self.responses.calls), 0)
+
+    def test_export_credentials(self):
+        # given
+        pages = {
+            '1': {"credentials": [{"id": "c1"}, {"id": "c2"}], "meta": {"last_page": 2}},
+            '2': {"credentials": [{"id": "c3"}], "meta": {"last_page": 2}},
+        }
+
+        def list_credentials(request):
+            page = parse_qs(urlparse(request.url).query)['page'][0]
+            return success(pages[page])
+
+        self.responses.add_callback(
+            responses.GET, 'https://api.sertiva.id/api/v2/credentials', callback=list_credentials)
+
+        # when
+        code, stdout, _ = self.run_cli('export', 'credentials')
+
+        # then
+        self.assertEqual(code, 0)
+        self.assertEqual([json.loads(line)['id'] for line in stdout.splitlines()], ['c1', 'c2', 'c3'])
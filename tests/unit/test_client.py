@@ -1,11 +1,16 @@
 from datetime import datetime as date
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
+import threading
+import time
 import uuid
 
 import responses
 from unittest import TestCase
 
 from sertipy.client import Sertiva
+from sertipy.exceptions import SertipyException
 
 
 class TestSertiva(TestCase):
@@ -355,3 +360,81 @@ class TestSertivaMain(TestSertiva):
         # then
         self.assertEqual(len(self.responses.calls), 1)
         self.assertEqual(data, resp)
+
+
+class TestSingleFlight(TestSertiva):
+    def setUp(self) -> None:
+        super().setUp()
+        self.credential_id = str(uuid.uuid4())
+        self.url = f'https://api.sertiva.id/api/v2/credentials/{self.credential_id}'
+        self.release = threading.Event()
+
+    def add_slow_detail(self, status=200):
+        def callback(request):
+            self.release.wait(5)
+            return status, {}, json.dumps({"code": status, "status": "success", "message": "", "data": {}})
+
+        self.responses.add_callback(responses.GET, self.url, callback=callback, content_type='application/json')
+
+    def detail_calls(self):
+        return [call for call in self.responses.calls if call.request.url == self.url]
+
+    def test_threads_share_one_request(self):
+        # given
+        self.add_slow_detail()
+
+        # when
+        with ThreadPoolExecutor(5) as pool:
+            futures = [pool.submit(self.sertiva.credentials.detail, self.credential_id) for _ in range(5)]
+            time.sleep(0.2)
+            self.release.set()
+            results = [future.result() for future in futures]
+
+        # then
+        self.assertEqual(len(self.detail_calls()), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_threads_share_error(self):
+        # given
+        self.add_slow_detail(status=404)
+
+        # when
+        with ThreadPoolExecutor(3) as pool:
+            futures = [pool.submit(self.sertiva.credentials.detail, self.credential_id) for _ in range(3)]
+            time.sleep(0.2)
+            self.release.set()
+
+        # then
+        self.assertEqual(len(self.detail_calls()), 1)
+        for future in futures:
+            self.assertIsInstance(future.exception(), SertipyException)
+
+    def test_asyncio_tasks_share_one_request(self):
+        # given
+        self.add_slow_detail()
+
+        async def detail_many():
+            loop = asyncio.get_running_loop()
+            calls = [loop.run_in_executor(None, self.sertiva.credentials.detail, self.credential_id)
+                     for _ in range(5)]
+            loop.call_later(0.2, self.release.set)
+            return await asyncio.gather(*calls)
+
+        # when
+        results = asyncio.run(detail_many())
+
+        # then
+        self.assertEqual(len(self.detail_calls()), 1)
+        self.assertEqual(len(results), 5)
+
+    def test_sequential_requests_are_not_shared(self):
+        # given
+        self.release.set()
+        self.add_slow_detail()
+
+        # when
+        self.sertiva.credentials.detail(self.credential_id)
+        self.sertiva.credentials.detail(self.credential_id)
+
+        # then
+        self.assertEqual(len(self.detail_calls()), 2)
@@ -0,0 +1,68 @@
+import os
+import re
+import subprocess
+import sys
+
+from unittest import TestCase, skipUnless
+
+# cumulative import time budget for sertipy.client in microseconds, the wall-clock check
+# only runs when it is set, e.g. SERTIPY_IMPORT_BUDGET_US=50000 python -m pytest tests/unit/test_import.py
+IMPORT_BUDGET_US = os.environ.get('SERTIPY_IMPORT_BUDGET_US')
+HEAVY_MODULES = ['requests', 'urllib3', 'concurrent.futures']
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *options, '-c', code],
+                          capture_output=True, text=True, check=True)
+
+
+class TestLazyImport(TestCase):
+    def test_client_does_not_import_heavy_modules(self):
+        # when
+        result = run_python(
+            "import sys, sertipy.client\n"
+            "sertipy.client.Sertiva('', '')\n"
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+
+        # then
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_top_level_namespace(self):
+        # when
+        result = run_python(
+            "import sys, sertipy\n"
+            "loaded = 'sertipy.client' in sys.modules\n"
+            "print(loaded, sertipy.Sertiva.__module__, sertipy.SertipyException.__name__)")
+
+        # then
+        self.assertEqual(result.stdout.split(), ['False', 'sertipy.client', 'SertipyException'])
+
+    def test_dir_lists_names_once(self):
+        # when
+        result = run_python(
+            "import sertipy\n"
+            "sertipy.Sertiva\n"
+            "print(dir(sertipy).count('Sertiva'), 'SertivaPipeline' in dir(sertipy))")
+
+        # then
+        self.assertEqual(result.stdout.split(), ['1', 'True'])
+
+    def test_unknown_attribute(self):
+        import sertipy
+
+        with self.assertRaises(AttributeError):
+            sertipy.Unknown
+
+
+@skipUnless(IMPORT_BUDGET_US, 'set SERTIPY_IMPORT_BUDGET_US to check the import time')
+class TestImportTime(TestCase):
+    def test_import_time_budget(self):
+        # when, the best of a few runs to reduce noise
+        timings = []
+        for _ in range(3):
+            result = run_python('import sertipy.client', '-X', 'importtime')
+            match = re.search(r'^import time:\s+\d+ \|\s+(\d+) \| sertipy\.client$', result.stderr, re.MULTILINE)
+            timings.append(int(match.group(1)))
+
+        # then
+        self.assertLess(min(timings), int(IMPORT_BUDGET_US))
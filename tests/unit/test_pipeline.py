@@ -0,0 +1,199 @@
+import json
+import time
+import uuid
+
+import responses
+from unittest import TestCase
+
+from sertipy.client import Sertiva
+from sertipy.pipeline import chunked, SertivaPipeline
+from tests.unit.fake_api import create_recipients, issue_credentials, verify_credentials
+
+
+class TestChunked(TestCase):
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_chunked_reads_lazily(self):
+        rows = iter(range(10))
+        chunks = chunked(rows, 3)
+
+        self.assertEqual(next(chunks), [0, 1, 2])
+        self.assertEqual(next(rows), 3)
+
+
+class TestSertivaPipeline(TestCase):
+    def setUp(self) -> None:
+        self.sertiva = Sertiva('', '')
+        self.sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+        self.responses = responses.RequestsMock(assert_all_requests_are_fired=False)
+        self.responses.start()
+
+        self.template_id = str(uuid.uuid4())
+        self.responses.add(
+            responses.POST, 'https://api.sertiva.id/api/v2/templates',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": {"id": self.template_id}})}',
+            status=200,
+            content_type='application/json')
+        self.responses.add_callback(
+            responses.POST, f'https://api.sertiva.id/api/v2/templates/{self.template_id}/recipients',
+            callback=create_recipients,
+            content_type='application/json')
+        self.responses.add_callback(
+            responses.POST, 'https://api.sertiva.id/api/v2/issue',
+            callback=issue_credentials,
+            content_type='application/json')
+        self.responses.add_callback(
+            responses.POST, 'https://api.sertiva.id/api/v2/verify',
+            callback=verify_credentials,
+            content_type='application/json')
+
+        self.addCleanup(self.responses.stop)
+        self.addCleanup(self.responses.reset)
+
+    def _calls(self, path):
+        return [call for call in self.responses.calls if call.request.url.endswith(path)]
+
+    def test_run(self):
+        # given
+        rows = ({"name": f"r{x}", "email": f"r{x}@email.com"} for x in range(25))
+
+        # when
+        summary = self.sertiva.pipeline(chunk_size=10, create_workers=2) \
+            .template('design', 'Some Title', 'Some Description') \
+            .recipients(rows) \
+            .issue('2021-05-01', '2022-05-01') \
+            .verify(sample_size=2) \
+            .run()
+
+        # then
+        self.assertTrue(summary.ok)
+        self.assertEqual(summary.template_id, self.template_id)
+        self.assertEqual(summary.chunks, 3)
+        self.assertEqual(summary.recipients_created, 25)
+        self.assertEqual(summary.credentials_issued, 25)
+        self.assertCountEqual(summary.credential_ids, [f'credential-{x}' for x in summary.recipient_ids])
+        self.assertEqual(len(summary.verified), 6)
+        self.assertEqual(len(self._calls('/recipients')), 3)
+        self.assertEqual(len(self._calls('/issue')), 3)
+        self.assertEqual(len(self._calls('/verify')), 3)
+
+    def test_run_backpressure_on_verify(self):
+        # given, verify is the slowest stage
+        read = []
+        read_at_verify = []
+
+        def rows():
+            for x in range(40):
+                read.append(x)
+                yield {"name": f"r{x}"}
+
+        def slow_verify(request):
+            read_at_verify.append(len(read))
+            time.sleep(0.01)
+            return verify_credentials(request)
+
+        self.responses.remove(responses.POST, 'https://api.sertiva.id/api/v2/verify')
+        self.responses.add_callback(
+            responses.POST, 'https://api.sertiva.id/api/v2/verify',
+            callback=slow_verify,
+            content_type='application/json')
+
+        # when
+        summary = SertivaPipeline(self.sertiva, chunk_size=1, create_workers=1, issue_workers=1, max_pending=2) \
+            .use_template(self.template_id) \
+            .recipients(rows()) \
+            .issue('2021-05-01', '2022-05-01') \
+            .verify(sample_size=1) \
+            .run()
+
+        # then, rows are read only a few chunks ahead of verify
+        self.assertTrue(summary.ok)
+        self.assertEqual(len(summary.verified), 40)
+        for started, read_count in enumerate(read_at_verify[:-10]):
+            self.assertLessEqual(read_count - started, 8)
+
+    def test_run_collects_stage_errors(self):
+        # given
+        self.responses.replace(
+            responses.POST, 'https://api.sertiva.id/api/v2/issue',
+            body=f'{json.dumps({"code": 400, "status": "fail", "message": "bad request"})}',
+            status=400,
+            content_type='application/json')
+
+        # when
+        summary = SertivaPipeline(self.sertiva, chunk_size=2) \
+            .use_template(self.template_id) \
+            .recipients([{"name": "r1"}, {"name": "r2"}, {"name": "r3"}]) \
+            .issue('2021-05-01', '2022-05-01') \
+            .run()
+
+        # then
+        self.assertFalse(summary.ok)
+        self.assertEqual(summary.recipients_created, 3)
+        self.assertEqual(summary.credentials_issued, 0)
+        self.assertEqual(summary.failed_rows, 3)
+        self.assertCountEqual([(stage, index) for stage, index, _ in summary.errors],
+                              [('issue', 0), ('issue', 1)])
+
+    def test_run_read_error(self):
+        # given, the rows fail after the second chunk
+        def rows():
+            yield from ({"name": f"r{x}"} for x in range(4))
+            raise ValueError('bad line')
+
+        # when
+        summary = SertivaPipeline(self.sertiva, chunk_size=2) \
+            .use_template(self.template_id) \
+            .recipients(rows()) \
+            .issue('2021-05-01', '2022-05-01') \
+            .run()
+
+        # then, the chunks read before are issued
+        self.assertEqual(summary.credentials_issued, 4)
+        self.assertEqual([(stage, index) for stage, index, _ in summary.errors], [('read', 2)])
+
+    def test_run_resume_created_chunks(self):
+        # given, chunk 0 is done and chunk 1 was created by a previous run
+        rows = [{"name": f"r{x}"} for x in range(6)]
+        created = []
+
+        # when
+        summary = SertivaPipeline(self.sertiva, chunk_size=2) \
+            .use_template(self.template_id) \
+            .recipients(rows, skip_chunks=[0], created={1: ['a', 'b']}) \
+            .issue('2021-05-01', '2022-05-01') \
+            .run(on_created=lambda index, ids: created.append(index))
+
+        # then, only chunk 2 is created and chunks 1 and 2 are issued
+        self.assertEqual(created, [2])
+        self.assertEqual(len(self._calls('/recipients')), 1)
+        self.assertEqual(len(self._calls('/issue')), 2)
+        self.assertIn('credential-a', summary.credential_ids)
+
+    def test_run_without_template(self):
+        with self.assertRaises(ValueError):
+            SertivaPipeline(self.sertiva).recipients([]).run()
+
+    def test_run_validate(self):
+        # given
+        fields = [{"name": "credentialSubject.activityDate", "type": "date", "required": True}]
+        self.responses.add(
+            responses.GET, f'https://api.sertiva.id/api/v2/templates/{self.template_id}',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": {"fields": fields}})}',
+            status=200,
+            content_type='application/json')
+        valid = {"name": "r1", "fields": {"credentialSubject": {"activityDate": "2021-05-01"}}}
+        invalid = {"name": "r2", "fields": {}}
+
+        # when
+        summary = SertivaPipeline(self.sertiva, chunk_size=2) \
+            .use_template(self.template_id) \
+            .recipients([valid, invalid, invalid, invalid, valid]) \
+            .validate() \
+            .run()
+
+        # then
+        self.assertEqual(summary.recipients_created, 2)
+        self.assertEqual([index for index, _, _ in summary.rejected], [1, 2, 3])
+        self.assertEqual(len(self._calls('/recipients')), 2)
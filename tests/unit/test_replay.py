@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+import uuid
+
+import responses
+from unittest import TestCase
+
+from sertipy.client import Sertiva
+from sertipy.exceptions import SertipyException
+from sertipy.replay import anonymise, load_test, RecordingTransport, ReplayTransport
+
+
+class TestAnonymise(TestCase):
+    def test_anonymise(self):
+        # given
+        recipient_id = str(uuid.uuid4())
+        body = {"data": {"recipients": [{"id": recipient_id, "name": "John", "email": "john@doe.com"}],
+                         "ids": [recipient_id]}}
+
+        # when
+        result = anonymise(body)
+
+        # then
+        recipient = result['data']['recipients'][0]
+        self.assertEqual(recipient['name'], 'xxxx')
+        self.assertEqual(len(recipient['email']), len('john@doe.com'))
+        self.assertNotEqual(recipient['id'], recipient_id)
+        self.assertEqual(result['data']['ids'], [recipient['id']])
+
+    def test_anonymise_custom_fields(self):
+        # given
+        body = {"status": "success", "data": {"id": "not-a-uuid", "fields": {"credentialSubject": {
+            "fullName": "Jane Roe", "nik": "3201010101", "phone": 628123, "score": 87.5, "passed": True}}},
+            "meta": {"last_page": 3}}
+
+        # when
+        result = anonymise(body)
+
+        # then
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['data']['id'], 'xxxxxxxxxx')
+        self.assertEqual(result['data']['fields']['credentialSubject'], {
+            "fullName": "xxxxxxxx", "nik": "xxxxxxxxxx", "phone": 111111, "score": 11.1, "passed": True})
+        self.assertEqual(result['meta'], {"last_page": 3})
+        self.assertNotIn('Jane', json.dumps(result))
+
+    def test_anonymise_nested_numbers(self):
+        # when
+        result = anonymise({'data': {'fields': {'credentialSubject': {'nik': 3201010101, 'phone': 628123}}}})
+
+        # then
+        self.assertEqual(result, {'data': {'fields': {'credentialSubject': {'nik': 1111111111, 'phone': 111111}}}})
+
+
+class TestRecordReplay(TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'traffic.jsonl')
+
+        self.responses = responses.RequestsMock(assert_all_requests_are_fired=False)
+        self.responses.start()
+        self.addCleanup(self.responses.stop)
+        self.addCleanup(self.responses.reset)
+
+        self.credential_id = str(uuid.uuid4())
+        data = {"id": self.credential_id, "name": "John"}
+        self.responses.add(
+            responses.GET, f'https://api.sertiva.id/api/v2/credentials/{self.credential_id}',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": data})}',
+            status=200,
+            content_type='application/json')
+
+    def record(self):
+        sertiva = Sertiva('', '', transport=RecordingTransport(self.path))
+        sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+        return sertiva.credentials.detail(self.credential_id)
+
+    def test_record(self):
+        # when
+        self.record()
+
+        # then
+        with open(self.path) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['path'], '/api/v2/credentials/{id}')
+        self.assertEqual(entries[0]['status'], 200)
+        self.assertEqual(entries[0]['body']['data']['name'], 'xxxx')
+        self.assertNotIn(self.credential_id, json.dumps(entries[0]))
+
+    def test_record_masks_path_ids(self):
+        # given, an id which is not a uuid
+        self.responses.add(
+            responses.GET, 'https://api.sertiva.id/api/v2/templates/NIK3201010101/recipients',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": {"recipients": []}})}',
+            status=200,
+            content_type='application/json')
+        sertiva = Sertiva('', '', transport=RecordingTransport(self.path))
+        sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+
+        # when
+        sertiva.recipients.list('NIK3201010101', 2)
+
+        # then
+        with open(self.path) as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry['path'], '/api/v2/templates/{id}/recipients')
+        self.assertEqual(entry['params'], {"page": 2})
+        self.assertNotIn('3201010101', json.dumps(entry))
+
+    def test_replay(self):
+        # given
+        self.record()
+        self.responses.stop()
+        sertiva = Sertiva('', '', transport=ReplayTransport(self.path, latency=False))
+        sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+
+        # when, any credential id matches the recorded path
+        resp = sertiva.credentials.detail(uuid.uuid4())
+
+        # then
+        self.assertEqual(resp['status'], 'success')
+        self.assertEqual(resp['data']['name'], 'xxxx')
+        with self.assertRaises(SertipyException):
+            sertiva.templates.detail(uuid.uuid4())
+
+    def test_replay_without_cached_token(self):
+        # given
+        self.record()
+        self.responses.stop()
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(self.path))
+        self.addCleanup(os.chdir, cwd)
+
+        # when, the token is requested from the replay
+        sertiva = Sertiva('', '', transport=ReplayTransport(self.path, latency=False))
+        resp = sertiva.credentials.detail(uuid.uuid4())
+
+        # then, the token cache file is not touched
+        self.assertEqual(resp['status'], 'success')
+        self.assertFalse(os.path.exists('.cache'))
+
+    def test_load_test(self):
+        # given
+        self.record()
+        sertiva = Sertiva('', '', transport=ReplayTransport(self.path, speed=1000))
+        sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+
+        # when
+        report = load_test(lambda i: sertiva.credentials.detail(uuid.uuid4()), total=50, concurrency=5)
+
+        # then
+        self.assertEqual(report.count, 50)
+        self.assertEqual(report.errors, 0)
+        self.assertGreater(report.throughput, 0)
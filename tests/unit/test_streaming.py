@@ -0,0 +1,230 @@
+import json
+import uuid
+
+import responses
+from unittest import TestCase
+
+from sertipy.client import Sertiva
+from sertipy.exceptions import SertipyException
+from sertipy.streaming import iter_items
+
+
+def byte_chunks(body: bytes, size: int):
+    return (body[i:i + size] for i in range(0, len(body), size))
+
+
+class TestIterItems(TestCase):
+    def test_iter_items(self):
+        # given
+        credentials = [{"id": str(uuid.uuid4()), "number": 12345, "ratio": 2.5, "big": 1.5e+300,
+                        "small": -3.25e-7, "name": "Jöhn"} for _ in range(20)] + [2.5, 1e3, -12]
+        body = json.dumps({"code": 200, "ratio": 0.5, "meta": {"pages": [1, 2]},
+                           "data": {"meta": {}, "credentials": credentials}}).encode('utf-8')
+
+        # when, one byte at a time splits numbers, strings and utf-8 characters
+        items = list(iter_items(byte_chunks(body, 1), ('data', 'credentials')))
+
+        # then
+        self.assertEqual(items, credentials)
+
+    def test_iter_items_split_numbers(self):
+        for chunks in ([b'{"data":{"credentials":[2.', b'5]}}'],
+                       [b'{"data":{"credentials":[1e', b'3]}}'],
+                       [b'{"data":{"credentials":[1.5E', b'+3]}}'],
+                       [b'{"data":{"credentials":[-', b'1]}}'],
+                       [b'{"ratio": 0.', b'5, "data":{"credentials":[7]}}']):
+            with self.subTest(chunks=chunks):
+                value = json.loads(b''.join(chunks))['data']['credentials']
+                self.assertEqual(list(iter_items(chunks, ('data', 'credentials'))), value)
+
+    def test_iter_items_max_buffer_size_per_item(self):
+        # given, small items in one chunk larger than the limit
+        body = json.dumps({"data": [{"id": x} for x in range(1000)]}).encode('utf-8')
+
+        # when
+        items = list(iter_items([body], ('data',), max_buffer_size=20))
+
+        # then
+        self.assertEqual(len(items), 1000)
+
+    def test_iter_items_data_array(self):
+        self.assertEqual(list(iter_items([b'{"data": [1, 22', b'3, "x"]}'], ('data',))), [1, 223, 'x'])
+
+    def test_iter_items_empty(self):
+        self.assertEqual(list(iter_items([b'{"data": {"credentials": []}}'], ('data', 'credentials'))), [])
+
+    def test_iter_items_missing_array(self):
+        with self.assertRaises(SertipyException):
+            list(iter_items([b'{"data": {"meta": {}}}'], ('data', 'credentials')))
+
+    def test_iter_items_max_buffer_size(self):
+        # given
+        body = json.dumps({"data": [{"id": "x" * 1000}]}).encode('utf-8')
+
+        # taken
+        with self.assertRaises(SertipyException):
+            # when
+            list(iter_items(byte_chunks(body, 10), ('data',), max_buffer_size=100))
+
+
+class TestStreamResponse(TestCase):
+    def setUp(self) -> None:
+        self.sertiva = Sertiva('', '')
+        self.sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+        self.responses = responses.RequestsMock()
+        self.responses.start()
+        self.addCleanup(self.responses.stop)
+        self.addCleanup(self.responses.reset)
+
+    def test_list_stream(self):
+        # given
+        credentials = [{"id": str(uuid.uuid4())} for _ in range(100)]
+        data = {"code": 200, "status": "success", "data": {"credentials": credentials, "meta": {}}}
+        self.responses.add(
+            responses.GET, 'https://api.sertiva.id/api/v2/credentials',
+            body=f'{json.dumps(data)}',
+            status=200,
+            content_type='application/json')
+
+        # when
+        resp = self.sertiva.credentials.list(stream=True)
+
+        # then
+        self.assertEqual(len(self.responses.calls), 1)
+        self.assertEqual(list(resp), credentials)
+
+    def test_issue_stream(self):
+        # given
+        template_id = str(uuid.uuid4())
+        credentials = [{"id": str(uuid.uuid4())} for _ in range(3)]
+        data = {"code": 200, "status": "success", "data": {"credentials": credentials}}
+        self.responses.add(
+            responses.POST, 'https://api.sertiva.id/api/v2/issue',
+            body=f'{json.dumps(data)}',
+            status=200,
+            content_type='application/json')
+
+        # when, the request is sent before iterating
+        resp = self.sertiva.mains.issue(template_id, '2021-05-01', '2022-05-01', stream=True)
+
+        # then
+        self.assertEqual(len(self.responses.calls), 1)
+        self.assertEqual(list(resp), credentials)
+
+    def test_stream_error(self):
+        # given
+        data = {"code": 400, "status": "fail", "message": "There was a problem with the data submitted"}
+        self.responses.add(
+            responses.GET, 'https://api.sertiva.id/api/v2/credentials',
+            body=f'{json.dumps(data)}',
+            status=400,
+            content_type='application/json')
+
+        # taken
+        with self.assertRaises(SertipyException):
+            # when
+            self.sertiva.credentials.list(stream=True)
+
+    def test_list_all_stream(self):
+        # given
+        pages = [[{"id": "c1"}, {"id": "c2"}], [{"id": "c3"}]]
+        for page in pages:
+            self.responses.add(
+                responses.GET, 'https://api.sertiva.id/api/v2/credentials',
+                body=f'{json.dumps({"code": 200, "status": "success", "data": {"credentials": page}})}',
+                status=200,
+                content_type='application/json')
+
+        # when
+        resp = list(self.sertiva.credentials.list_all(stream=True))
+
+        # then, the short page is the last one
+        self.assertEqual([item['id'] for item in resp], ['c1', 'c2', 'c3'])
+        self.assertEqual(len(self.responses.calls), 2)
+
+    def test_list_all_stream_stops_on_repeated_page(self):
+        # given, the api answers the last page again for an out of range page
+        pages = [[{"id": "c1"}, {"id": "c2"}], [{"id": "c3"}, {"id": "c4"}], [{"id": "c3"}, {"id": "c4"}]]
+        for page in pages:
+            self.responses.add(
+                responses.GET, 'https://api.sertiva.id/api/v2/credentials',
+                body=f'{json.dumps({"code": 200, "status": "success", "data": {"credentials": page}})}',
+                status=200,
+                content_type='application/json')
+
+        # when
+        resp = list(self.sertiva.credentials.list_all(stream=True))
+
+        # then
+        self.assertEqual([item['id'] for item in resp], ['c1', 'c2', 'c3', 'c4'])
+        self.assertEqual(len(self.responses.calls), 3)
+
+
+class FakeStreamResponse:
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.body = body
+        self.status_code = status_code
+        self.closed = False
+
+    url = 'https://api.sertiva.id/api/v2/credentials'
+    reason = 'Bad Request'
+
+    def raise_for_status(self):
+        import requests
+
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+    def json(self):
+        return json.loads(self.body)
+
+    def iter_content(self, chunk_size):
+        return byte_chunks(self.body, chunk_size)
+
+    def close(self):
+        self.closed = True
+
+
+class TestStreamClose(TestCase):
+    def setUp(self) -> None:
+        body = json.dumps({"data": {"credentials": [{"id": "c1"}, {"id": "c2"}]}}).encode('utf-8')
+        self.response = FakeStreamResponse(body)
+        self.sertiva = Sertiva('', '', transport=lambda *args, **kwargs: self.response)
+        self.sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+
+    def test_close_when_read(self):
+        # when
+        list(self.sertiva.credentials.list(stream=True))
+
+        # then
+        self.assertTrue(self.response.closed)
+
+    def test_close_when_dropped_unused(self):
+        # when
+        resp = self.sertiva.credentials.list(stream=True)
+        self.assertFalse(self.response.closed)
+        del resp
+
+        # then
+        self.assertTrue(self.response.closed)
+
+    def test_close_on_error(self):
+        # given
+        self.response.status_code = 400
+        self.response.body = json.dumps({"message": "bad request"}).encode('utf-8')
+
+        # taken
+        with self.assertRaises(SertipyException):
+            # when
+            self.sertiva.credentials.list(stream=True)
+
+        # then
+        self.assertTrue(self.response.closed)
+
+    def test_close_with_context_manager(self):
+        # when
+        with self.sertiva.credentials.list(stream=True) as resp:
+            next(resp)
+
+        # then
+        self.assertTrue(self.response.closed)
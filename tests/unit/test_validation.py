@@ -0,0 +1,188 @@
+import json
+import threading
+import uuid
+
+import responses
+from unittest import TestCase
+
+from sertipy.client import Sertiva, SertivaRecipient
+from sertipy.exceptions import SertipyException, SertipyValidationError
+from sertipy.validation import RecipientValidator, TemplateValidators
+
+FIELDS = [
+    {"name": "credentialSubject.activityDate", "type": "date", "required": True},
+    {"name": "credentialSubject.credentialNumber", "type": "text"},
+]
+
+
+class TestRecipientValidator(TestCase):
+    def setUp(self) -> None:
+        self.validator = RecipientValidator(FIELDS)
+
+    def test_validate(self):
+        # given
+        row = {"name": "John Doe", "email": "john@doe.com",
+               "fields": {"credentialSubject": {"activityDate": "2021-05-01T19:23:24.000000"}}}
+
+        # then
+        self.assertEqual(self.validator.validate(row), [])
+
+    def test_validate_errors(self):
+        # given
+        row = {"name": "", "email": "john",
+               "fields": {"credentialSubject": {"credentialNumber": 1}}}
+
+        # then
+        self.assertEqual(self.validator.validate(row), [
+            'name must be a non empty text',
+            "email 'john' is not valid",
+            'fields.credentialSubject.activityDate is required',
+            'fields.credentialSubject.credentialNumber must be text',
+        ])
+
+    def test_validate_integer(self):
+        # given
+        validator = RecipientValidator([{"name": "credentialSubject.score", "type": "integer"}])
+
+        def row(score):
+            return {"fields": {"credentialSubject": {"score": score}}}
+
+        # then
+        for score in (7, -7, 7.0, '7', '-7'):
+            with self.subTest(score=score):
+                self.assertEqual(validator.validate(row(score)), [])
+        for score in (7.5, '7.5', '1e3', True, 'seven'):
+            with self.subTest(score=score):
+                self.assertEqual(validator.validate(row(score)), ['fields.credentialSubject.score must be integer'])
+
+    def test_validate_number(self):
+        # given
+        validator = RecipientValidator([{"name": "credentialSubject.score", "type": "number"}])
+
+        def row(score):
+            return {"fields": {"credentialSubject": {"score": score}}}
+
+        # then
+        for score in (7, 7.5, '7.5', '1e3', 10 ** 400):
+            with self.subTest(score=score):
+                self.assertEqual(validator.validate(row(score)), [])
+        for score in ('nan', 'inf', '-Infinity', float('inf'), True, 'seven'):
+            with self.subTest(score=score):
+                self.assertEqual(validator.validate(row(score)), ['fields.credentialSubject.score must be number'])
+
+    def test_partition(self):
+        # given
+        valid = {"name": "r1", "fields": {"credentialSubject": {"activityDate": "2021-05-01"}}}
+        invalid = {"name": "r2", "fields": {"credentialSubject": {"activityDate": "yesterday"}}}
+
+        # when
+        result = self.validator.partition([valid, invalid, valid])
+
+        # then
+        self.assertFalse(result.ok)
+        self.assertEqual(result.valid, [valid, valid])
+        self.assertEqual(result.invalid,
+                         [(1, invalid, ['fields.credentialSubject.activityDate must be date'])])
+
+
+class TestTemplateValidators(TestCase):
+    def setUp(self) -> None:
+        self.sertiva = Sertiva('', '')
+        self.sertiva.auth.auth_cache.cached_token_info = 'ACCESS TOKEN'
+        self.responses = responses.RequestsMock()
+        self.responses.start()
+        self.addCleanup(self.responses.stop)
+        self.addCleanup(self.responses.reset)
+
+        self.template_id = str(uuid.uuid4())
+        self.design_id = str(uuid.uuid4())
+        self.responses.add(
+            responses.GET, f'https://api.sertiva.id/api/v2/templates/{self.template_id}',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": {"design_id": self.design_id}})}',
+            status=200,
+            content_type='application/json')
+        self.responses.add(
+            responses.GET, f'https://api.sertiva.id/api/v2/designs/{self.design_id}',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": {"fields": FIELDS}})}',
+            status=200,
+            content_type='application/json')
+
+    def test_get_is_cached(self):
+        # when
+        validator = self.sertiva.validators.get(self.template_id)
+
+        # then
+        self.assertIs(self.sertiva.validators.get(self.template_id), validator)
+        self.assertEqual(len(validator.checks), 2)
+        self.assertEqual(len(self.responses.calls), 2)
+
+    def test_get_does_not_block_other_templates(self):
+        # given, the schema of template a is slow to fetch
+        release = threading.Event()
+
+        class Templates:
+            @staticmethod
+            def detail(template_id):
+                if template_id == 'a':
+                    release.wait(5)
+                return {"data": {"fields": FIELDS}}
+
+        validators = TemplateValidators(Templates(), None)
+        slow = threading.Thread(target=validators.get, args=('a',))
+        slow.start()
+        self.addCleanup(slow.join)
+        self.addCleanup(release.set)
+
+        # when
+        validator = validators.get('b')
+
+        # then
+        self.assertFalse(release.is_set())
+        self.assertEqual(len(validator.checks), 2)
+
+    def test_get_without_fields_warns(self):
+        # given
+        self.responses.replace(
+            responses.GET, f'https://api.sertiva.id/api/v2/designs/{self.design_id}',
+            body=f'{json.dumps({"code": 200, "status": "success", "data": {}})}',
+            status=200,
+            content_type='application/json')
+
+        # when
+        with self.assertLogs('sertipy.validation', level='WARNING') as logs:
+            validator = self.sertiva.validators.get(self.template_id)
+
+        # then
+        self.assertEqual(validator.checks, [])
+        self.assertIn(f'No fields found for template {self.template_id}', logs.output[0])
+
+    def test_create_validate(self):
+        # given
+        recipients = [{"name": "r1", "email": "r1@email.com"}]
+
+        # taken
+        with self.assertRaises(SertipyValidationError) as context:
+            # when
+            self.sertiva.recipients.create(self.template_id, recipients, validate=True)
+
+        # then, only the template and design are requested
+        self.assertEqual(len(self.responses.calls), 2)
+        self.assertEqual(context.exception.invalid[0][0], 0)
+
+    def test_create_validate_without_sertiva(self):
+        # given
+        recipients = SertivaRecipient(self.sertiva.auth)
+
+        # taken
+        with self.assertRaises(SertipyValidationError):
+            # when
+            recipients.create(self.template_id, [{"name": "r1"}], validate=True)
+
+    def test_issue_validate_needs_recipients(self):
+        # taken
+        with self.assertRaises(SertipyException):
+            # when
+            self.sertiva.mains.issue(self.template_id, '2021-05-01', '2022-05-01', ['id'], validate=True)
+
+        # then
+        self.assertEqual(len(self.responses.calls), 0)